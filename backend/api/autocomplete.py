@@ -0,0 +1,67 @@
+from bisect import bisect_left
+from threading import Lock
+
+from recipes.models import Ingredient
+from recipes.versions import get_version
+
+from .replicas import use_primary
+from .serializers import IngredientSerializer
+
+
+class IngredientIndex:
+
+    def __init__(self):
+        self.version = None
+        self.index = ([], [])
+        self.lock = Lock()
+
+    def load(self):
+        version = get_version('ingredients')
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            with use_primary():
+                ingredients = IngredientSerializer(
+                    Ingredient.objects.all(),
+                    many=True
+                ).data
+            ingredients = sorted(
+                ingredients,
+                key=lambda ingredient: (
+                    ingredient['name'].casefold(),
+                    ingredient['id']
+                )
+            )
+            names = [
+                ingredient['name'].casefold() for ingredient in ingredients
+            ]
+            self.index = (names, ingredients)
+            self.version = version
+
+    def search(self, query, limit):
+        self.load()
+        names, ingredients = self.index
+        query = query.casefold()
+        position = bisect_left(names, query)
+        matches = []
+        while position < len(names) and names[position] == query:
+            matches.append(ingredients[position])
+            position += 1
+        while (
+            position < len(names)
+            and names[position].startswith(query)
+            and len(matches) < limit
+        ):
+            matches.append(ingredients[position])
+            position += 1
+        for position, name in enumerate(names):
+            if len(matches) >= limit:
+                break
+            if query in name and not name.startswith(query):
+                matches.append(ingredients[position])
+        return matches[:limit]
+
+
+ingredient_index = IngredientIndex()
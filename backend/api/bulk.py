@@ -0,0 +1,99 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .membership import MEMBERSHIP_FIELDS, forget_members
+from recipes.cart import refresh_cart_totals
+from recipes.counters import recount_favorites, recount_followers
+from recipes.feed import backfill_feed
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart
+from users.models import Subscription
+
+User = get_user_model()
+
+ADDED = 'added'
+EXISTS = 'exists'
+NOT_FOUND = 'not_found'
+SELF = 'self'
+REMOVED = 'removed'
+MISSING = 'missing'
+
+
+def favorites_added(user, recipe_ids):
+    recount_favorites(Recipe.objects.filter(pk__in=recipe_ids))
+
+
+def carts_added(user, recipe_ids):
+    refresh_cart_totals([user.pk], recipe_ids)
+
+
+def subscriptions_added(user, author_ids):
+    recount_followers(User.objects.filter(pk__in=author_ids))
+    for author_id in author_ids:
+        backfill_feed(user.pk, author_id)
+
+
+MEMBERS_ADDED = {
+    FavoriteRecipe: favorites_added,
+    ShoppingCart: carts_added,
+    Subscription: subscriptions_added,
+}
+
+
+def members_added(model, user, member_ids):
+    MEMBERS_ADDED[model](user, member_ids)
+    forget_members(model, user.pk)
+
+
+@transaction.atomic
+def bulk_add(model, user, member_ids):
+    user_field, member_field = MEMBERSHIP_FIELDS[model]
+    member_ids = list(dict.fromkeys(member_ids))
+    related_model = model._meta.get_field(member_field).related_model
+    found = dict(related_model.objects.filter(pk__in=member_ids).annotate(
+        is_member=Exists(model.objects.filter(**{
+            user_field: user,
+            member_field: OuterRef('pk')
+        }))
+    ).order_by().values_list('pk', 'is_member'))
+    results = {}
+    for member_id in member_ids:
+        if member_id not in found:
+            results[member_id] = NOT_FOUND
+        elif found[member_id]:
+            results[member_id] = EXISTS
+        elif model is Subscription and member_id == user.pk:
+            results[member_id] = SELF
+        else:
+            results[member_id] = ADDED
+    added = [
+        member_id for member_id, result in results.items()
+        if result == ADDED
+    ]
+    if added:
+        model.objects.bulk_create(
+            [
+                model(**{user_field: user, member_field: member_id})
+                for member_id in added
+            ],
+            ignore_conflicts=True
+        )
+        members_added(model, user, added)
+    return results
+
+
+@transaction.atomic
+def bulk_remove(model, user, member_ids):
+    user_field, member_field = MEMBERSHIP_FIELDS[model]
+    member_ids = list(dict.fromkeys(member_ids))
+    members = model.objects.filter(**{
+        user_field: user,
+        f'{member_field}__in': member_ids
+    })
+    removed = list(members.values_list(member_field, flat=True))
+    if removed:
+        members.delete()
+    return {
+        member_id: REMOVED if member_id in removed else MISSING
+        for member_id in member_ids
+    }
@@ -2,6 +2,8 @@ from django_filters.rest_framework import FilterSet, filters
 from django.contrib.auth import get_user_model
 
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import search_recipes
+from recipes.tags import filter_by_tags
 
 User = get_user_model()
 
@@ -19,12 +21,17 @@ class TagFilter(FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         queryset=Tag.objects.all(),
-        to_field_name='slug'
+        to_field_name='slug',
+        method='filter_tags'
     )
     is_favorited = filters.BooleanFilter(method='check_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='check_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='search_recipes')
+
+    def filter_tags(self, queryset, name, value):
+        return filter_by_tags(queryset, value)
 
     def check_is_favorited(self, queryset, name, value):
         current_user = self.request.user
@@ -38,11 +45,15 @@ class TagFilter(FilterSet):
             return queryset.filter(shopping_cart_recipes__user=current_user)
         return queryset
 
+    def search_recipes(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
     class Meta:
         model = Recipe
         fields = [
             'tags',
             'author',
             'is_favorited',
-            'is_in_shopping_cart'
+            'is_in_shopping_cart',
+            'search'
         ]
@@ -0,0 +1,68 @@
+from array import array
+from bisect import bisect_left
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import FavoriteRecipe, ShoppingCart
+from recipes.versions import bump_version, get_version
+from users.models import Subscription
+
+from .replicas import use_primary
+
+MEMBERSHIP_KEY = 'membership:{}:{}'
+MEMBERSHIP_FIELDS = {
+    FavoriteRecipe: ('user', 'recipe_id'),
+    ShoppingCart: ('user', 'recipe_id'),
+    Subscription: ('subscriber', 'author_id'),
+}
+OVERFLOW = 'overflow'
+
+
+def get_key(model, user_id):
+    return MEMBERSHIP_KEY.format(model._meta.model_name, user_id)
+
+
+def get_members(model, user):
+    key = get_key(model, user.pk)
+    key = f'{key}:{get_version(key)}'
+    members = cache.get(key)
+    if members is None:
+        user_field, member_field = MEMBERSHIP_FIELDS[model]
+        with use_primary():
+            member_ids = sorted(model.objects.filter(
+                **{user_field: user}
+            ).values_list(
+                member_field,
+                flat=True
+            )[:settings.MEMBERSHIP_CACHE_MAX_SIZE + 1])
+        if len(member_ids) > settings.MEMBERSHIP_CACHE_MAX_SIZE:
+            members = OVERFLOW
+        else:
+            members = array('q', member_ids)
+        cache.set(key, members, settings.MEMBERSHIP_CACHE_TIMEOUT)
+    if members == OVERFLOW:
+        return None
+    return members
+
+
+def contains(members, member_id):
+    position = bisect_left(members, member_id)
+    return position < len(members) and members[position] == member_id
+
+
+def is_member(context, model, user, member_id):
+    memberships = context.setdefault('memberships', {})
+    if model not in memberships:
+        memberships[model] = get_members(model, user)
+    members = memberships[model]
+    if members is None:
+        return None
+    return contains(members, member_id)
+
+
+def forget_members(model, user_id):
+    if settings.MEMBERSHIP_CACHE:
+        transaction.on_commit(partial(bump_version, get_key(model, user_id)))
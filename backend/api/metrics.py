@@ -0,0 +1,165 @@
+import logging
+from bisect import bisect_left
+from contextlib import ExitStack
+from threading import Lock
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+RESPONSE_SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+METRICS = (
+    (
+        'request_duration_seconds',
+        'Время обработки запроса',
+        DURATION_BUCKETS,
+    ),
+    (
+        'sql_queries',
+        'Количество SQL-запросов за запрос',
+        QUERY_COUNT_BUCKETS,
+    ),
+    (
+        'sql_duration_seconds',
+        'Суммарное время SQL-запросов за запрос',
+        DURATION_BUCKETS,
+    ),
+    (
+        'response_size_bytes',
+        'Размер ответа',
+        RESPONSE_SIZE_BUCKETS,
+    ),
+)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, view):
+        total = 0
+        for bucket, count in zip(self.buckets, self.counts):
+            total += count
+            yield f'{name}_bucket{{view="{view}",le="{bucket}"}} {total}'
+        yield f'{name}_bucket{{view="{view}",le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{view="{view}"}} {self.sum}'
+        yield f'{name}_count{{view="{view}"}} {self.count}'
+
+
+class Registry:
+
+    def __init__(self):
+        self.views = {}
+        self.lock = Lock()
+
+    def observe(self, view, *values):
+        with self.lock:
+            histograms = self.views.get(view)
+            if histograms is None:
+                histograms = self.views[view] = [
+                    Histogram(buckets) for _, _, buckets in METRICS
+                ]
+            for histogram, value in zip(histograms, values):
+                histogram.observe(value)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for position, (name, description, _) in enumerate(METRICS):
+                name = f'foodgram_{name}'
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for view, histograms in sorted(self.views.items()):
+                    lines.extend(histograms[position].render(name, view))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += perf_counter() - started
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view = match.func
+    view_class = getattr(view, 'cls', None) or getattr(
+        view,
+        'view_class',
+        None
+    )
+    if view_class is None:
+        return match.view_name
+    actions = getattr(view, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class QueryMetricsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        duration = perf_counter() - started
+        view = get_view_name(request)
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(view, duration, counter.count, counter.duration, size)
+        if counter.count > settings.METRICS_QUERY_BUDGET:
+            logger.warning(
+                '%s %s: %s SQL-запросов за %.3f с (бюджет %s)',
+                request.method,
+                view,
+                counter.count,
+                counter.duration,
+                settings.METRICS_QUERY_BUDGET
+            )
+        return response
+
+
+def metrics_view(request):
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    token = settings.METRICS_TOKEN
+    if token and request.META.get('HTTP_AUTHORIZATION') != f'Bearer {token}':
+        raise Http404
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,291 @@
+from functools import update_wrapper
+from hashlib import md5
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipes.versions import get_version
+
+from .replicas import use_primary
+
+
+class ReferenceDataCacheMixin:
+    cache_version_name = None
+    cache_timeout = 60 * 60 * 24
+
+    def get_cache_key(self, request):
+        query = '&'.join(
+            f'{key}={value}'
+            for key, values in sorted(request.query_params.lists())
+            for value in sorted(values)
+        )
+        return ':'.join([
+            self.cache_version_name,
+            str(get_version(self.cache_version_name)),
+            self.action,
+            str(self.kwargs.get(self.lookup_field, '')),
+            request.accepted_renderer.format,
+            query,
+        ])
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        etag = '"{}"'.format(md5(key.encode()).hexdigest())
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED,
+                headers={'ETag': etag}
+            )
+        data = cache.get(key)
+        if data is None:
+            with use_primary():
+                response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.set(key, data, self.cache_timeout)
+        return Response(data, headers={'ETag': etag})
+
+    async def acached_response(self, handler, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        etag = '"{}"'.format(md5(key.encode()).hexdigest())
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED,
+                headers={'ETag': etag}
+            )
+        data = await cache.aget(key)
+        if data is None:
+            with use_primary():
+                response = await handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            await cache.aset(key, data, self.cache_timeout)
+        return Response(data, headers={'ETag': etag})
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve,
+            request,
+            *args,
+            **kwargs
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acached_response(
+            super().alist,
+            request,
+            *args,
+            **kwargs
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acached_response(
+            super().aretrieve,
+            request,
+            *args,
+            **kwargs
+        )
+
+
+class AnonymousResponseCacheMixin:
+    cache_query_params = ()
+    cache_timeout = 60 * 10
+
+    def get_cache_lookup(self):
+        lookup = self.kwargs.get(self.lookup_field, '')
+        return str(int(lookup)) if lookup.isdigit() else lookup
+
+    def get_cache_versions(self):
+        versions = ['recipes', 'tags', 'ingredients']
+        if self.action == 'retrieve':
+            versions[0] = f'recipe:{self.get_cache_lookup()}'
+        return [str(get_version(name)) for name in versions]
+
+    def get_cache_key(self, request):
+        query = '&'.join(
+            f'{key}={value}'
+            for key in self.cache_query_params
+            for value in sorted(request.query_params.getlist(key))
+        )
+        return ':'.join([
+            'anonymous',
+            self.basename,
+            self.action,
+            self.get_cache_lookup(),
+            *self.get_cache_versions(),
+            request.get_host(),
+            request.accepted_renderer.format,
+            query,
+        ])
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not request.user.is_anonymous or not settings.SHARED_CACHE:
+            return handler(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is None:
+            with use_primary():
+                response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.set(key, data, self.cache_timeout)
+        return Response(data)
+
+    async def acached_response(self, handler, request, *args, **kwargs):
+        if not request.user.is_anonymous or not settings.SHARED_CACHE:
+            return await handler(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        data = await cache.aget(key)
+        if data is None:
+            with use_primary():
+                response = await handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            await cache.aset(key, data, self.cache_timeout)
+        return Response(data)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve,
+            request,
+            *args,
+            **kwargs
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acached_response(
+            super().alist,
+            request,
+            *args,
+            **kwargs
+        )
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acached_response(
+            super().aretrieve,
+            request,
+            *args,
+            **kwargs
+        )
+
+
+class AsyncReadMixin:
+    async_actions = ('list', 'retrieve')
+    async_action_map = {'get': 'list', 'head': 'list'}
+
+    @classmethod
+    def as_view(cls, *args, **initkwargs):
+        view = super().as_view(*args, **initkwargs)
+        if not settings.ASYNC_READ_VIEWS:
+            return view
+        actions = getattr(view, 'actions', None)
+        if actions is not None and 'get' in actions:
+            actions.setdefault('head', actions['get'])
+
+        async def async_view(request, *args, **kwargs):
+            action = (actions or cls.async_action_map).get(
+                request.method.lower()
+            )
+            if action not in cls.async_actions:
+                return await sync_to_async(view)(request, *args, **kwargs)
+            self = cls(**view.initkwargs)
+            if actions is not None:
+                self.action_map = actions
+            return await self.adispatch(
+                getattr(self, f'a{action}'),
+                request,
+                *args,
+                **kwargs
+            )
+
+        return update_wrapper(async_view, view)
+
+    async def adispatch(self, handler, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(
+            request,
+            response,
+            *args,
+            **kwargs
+        )
+        return self.response
+
+    def get_serializer_data(self, *args, **kwargs):
+        return self.get_serializer(*args, **kwargs).data
+
+    async def afilter_queryset(self):
+        return await sync_to_async(self.filter_queryset)(self.get_queryset())
+
+    async def aget_object(self):
+        queryset = await self.afilter_queryset()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (
+            queryset.model.DoesNotExist,
+            TypeError,
+            ValueError,
+            ValidationError
+        ):
+            raise Http404
+        await sync_to_async(self.check_object_permissions)(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        paginate_queryset = getattr(
+            self.paginator,
+            'apaginate_queryset',
+            None
+        )
+        if paginate_queryset is None:
+            return await sync_to_async(self.paginate_queryset)(queryset)
+        return await paginate_queryset(queryset, self.request, view=self)
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = await self.afilter_queryset()
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            data = await sync_to_async(self.get_serializer_data)(
+                page,
+                many=True
+            )
+            return self.get_paginated_response(data)
+        data = await sync_to_async(self.get_serializer_data)(
+            [obj async for obj in queryset],
+            many=True
+        )
+        return Response(data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        data = await sync_to_async(self.get_serializer_data)(instance)
+        return Response(data)
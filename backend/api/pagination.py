@@ -1,6 +1,155 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(
+                page_number=page_number,
+                message=str(exc)
+            )
+            raise NotFound(msg)
+        self.page.object_list = [
+            obj async for obj in self.page.object_list
+        ]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return list(self.page)
+
+
+class KeysetPagination(BasePagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор'
+    previous_marker = 'previous'
+
+    def get_page_size(self, request):
+        page_size = request.query_params.get(self.page_size_query_param, '')
+        if page_size.isdigit() and int(page_size) > 0:
+            return int(page_size)
+        return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            pub_date, recipe_id, *marker = urlsafe_b64decode(
+                encoded.encode()
+            ).decode().split('|')
+            if marker not in ([], [self.previous_marker]):
+                raise ValueError
+            position = datetime.fromisoformat(pub_date), int(recipe_id)
+        except (DecodeError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(marker)
+
+    def encode_cursor(self, position, previous=False):
+        pub_date, recipe_id = position
+        cursor = f'{pub_date.isoformat()}|{recipe_id}'
+        if previous:
+            cursor = f'{cursor}|{self.previous_marker}'
+        return urlsafe_b64encode(cursor.encode()).decode()
+
+    def get_link(self, position, previous=False):
+        if position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(position, previous)
+        )
+
+    def get_next_link(self):
+        return self.get_link(self.next_position)
+
+
+class RecipeCursorPagination(KeysetPagination):
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position, previous = self.decode_cursor(request)
+        if previous:
+            queryset = queryset.order_by('pub_date', 'id')
+        else:
+            queryset = queryset.order_by('-pub_date', '-id')
+        if position is not None:
+            pub_date, recipe_id = position
+            if previous:
+                queryset = queryset.filter(
+                    Q(pub_date__gt=pub_date)
+                    | Q(pub_date=pub_date, id__gt=recipe_id)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(pub_date__lt=pub_date)
+                    | Q(pub_date=pub_date, id__lt=recipe_id)
+                )
+        recipes = list(queryset[:page_size + 1])
+        has_more = len(recipes) > page_size
+        recipes = recipes[:page_size]
+        if previous:
+            recipes.reverse()
+        positions = [(recipe.pub_date, recipe.pk) for recipe in recipes]
+        first = positions[0] if positions else None
+        last = positions[-1] if positions else None
+        if previous:
+            self.next_position = last
+            self.previous_position = first if has_more else None
+        else:
+            self.next_position = last if has_more else None
+            self.previous_position = first if position is not None else None
+        return recipes
+
+    def get_previous_link(self):
+        return self.get_link(self.previous_position, previous=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+
+class FeedPagination(KeysetPagination):
+
+    def paginate_feed(self, get_feed, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position, _ = self.decode_cursor(request)
+        positions = get_feed(position, page_size + 1)
+        self.next_position = (
+            positions[page_size - 1] if len(positions) > page_size else None
+        )
+        return positions[:page_size]
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
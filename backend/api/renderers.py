@@ -0,0 +1,66 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class Echo:
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer):
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            return json.dumps(data, ensure_ascii=False).encode(self.charset)
+        return ''.join(self.stream(data)).encode(self.charset)
+
+    def stream(self, rows):
+        for name, measurement_unit, total in rows:
+            yield self.render_row(name, measurement_unit, total)
+
+    def render_row(self, name, measurement_unit, total):
+        return f'{name} ({measurement_unit}) — {total}\n'
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def __init__(self):
+        self.writer = csv.writer(Echo())
+
+    def render_row(self, name, measurement_unit, total):
+        return self.writer.writerow([name, measurement_unit, total])
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class JSONLinesShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'application/jsonl'
+    format = 'jsonl'
+
+    def render_row(self, name, measurement_unit, total):
+        return json.dumps(
+            {
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': total,
+            },
+            ensure_ascii=False
+        ) + '\n'
+
+
+SHOPPING_LIST_RENDERERS = (
+    CSVShoppingListRenderer,
+    TextShoppingListRenderer,
+    JSONLinesShoppingListRenderer,
+)
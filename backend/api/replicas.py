@@ -0,0 +1,70 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY_DATABASE = 'default'
+PRIMARY_APP_LABELS = ('authtoken', 'sessions')
+
+read_database = ContextVar('read_database', default=None)
+
+
+@contextmanager
+def use_primary():
+    token = read_database.set(None)
+    try:
+        yield
+    finally:
+        read_database.reset(token)
+
+
+def get_sticky_key(request):
+    credentials = request.META.get('HTTP_AUTHORIZATION') or (
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not credentials:
+        return None
+    return 'primary:{}'.format(sha256(credentials.encode()).hexdigest())
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        database = read_database.get()
+        if database is None or model._meta.app_label in PRIMARY_APP_LABELS:
+            return PRIMARY_DATABASE
+        return database
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DATABASE
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == PRIMARY_DATABASE
+
+
+class ReplicaMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = get_sticky_key(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            if key is not None:
+                cache.set(key, True, settings.DB_REPLICA_STICKY_SECONDS)
+            return response
+        if key is not None and cache.get(key):
+            return self.get_response(request)
+        token = read_database.set(random.choice(settings.DATABASE_REPLICAS))
+        try:
+            return self.get_response(request)
+        finally:
+            read_database.reset(token)
@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from djoser.serializers import UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 
+from jobs.models import Job
 from recipes.models import (
     FavoriteRecipe,
     Ingredient,
@@ -12,10 +16,26 @@ from recipes.models import (
     RecipeTag,
     ShoppingCart,
 )
+from recipes.cart import refresh_recipe_carts
+from recipes.search import update_search_vectors
+from recipes.similarity import schedule_similar_recipes
+from recipes.tags import get_tags_mask
 from users.models import Subscription
 
+from .membership import is_member
+from .renderers import SHOPPING_LIST_RENDERERS
+
 User = get_user_model()
 
+BULK_MAX_SIZE = 100
+
+
+def get_recipes_limit(request):
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None or not recipes_limit.isdigit():
+        return None
+    return int(recipes_limit)
+
 
 class CustomUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField(
@@ -26,6 +46,17 @@ class CustomUserSerializer(UserSerializer):
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
+        if hasattr(user, 'is_subscribed'):
+            return user.is_subscribed
+        if settings.MEMBERSHIP_CACHE:
+            is_subscribed = is_member(
+                self.context,
+                Subscription,
+                request.user,
+                user.pk
+            )
+            if is_subscribed is not None:
+                return is_subscribed
         return Subscription.objects.filter(
             subscriber=request.user,
             author=user
@@ -110,17 +141,32 @@ class ReadOnlyRecipeSerializer(serializers.ModelSerializer):
     )
     image = Base64ImageField()
 
-    def is_in_list(self, obj, model):
+    def is_in_list(self, obj, model, annotation):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
+        if settings.MEMBERSHIP_CACHE:
+            in_list = is_member(self.context, model, request.user, obj.pk)
+            if in_list is not None:
+                return in_list
         return model.objects.filter(user=request.user, recipe=obj).exists()
 
     def check_is_favorited(self, recipe):
-        return self.is_in_list(recipe, FavoriteRecipe)
+        return self.is_in_list(recipe, FavoriteRecipe, 'is_favorited')
 
     def check_is_in_shopping_cart(self, recipe):
-        return self.is_in_list(recipe, ShoppingCart)
+        return self.is_in_list(
+            recipe,
+            ShoppingCart,
+            'is_in_shopping_cart'
+        )
+
+    def to_representation(self, recipe):
+        if hasattr(recipe, 'is_subscribed'):
+            recipe.author.is_subscribed = recipe.is_subscribed
+        return super().to_representation(recipe)
 
     class Meta:
         read_only_fields = ['__all__']
@@ -139,6 +185,17 @@ class ReadOnlyRecipeSerializer(serializers.ModelSerializer):
         ]
 
 
+class MatchedRecipeSerializer(ReadOnlyRecipeSerializer):
+    matched_ingredients = serializers.IntegerField(read_only=True)
+    missing_ingredients = serializers.IntegerField(read_only=True)
+
+    class Meta(ReadOnlyRecipeSerializer.Meta):
+        fields = ReadOnlyRecipeSerializer.Meta.fields + [
+            'matched_ingredients',
+            'missing_ingredients',
+        ]
+
+
 class CreateOrUpdateRecipeSerializer(serializers.ModelSerializer):
     ingredients = CreateRecipeIngredientSerializer(
         read_only=False,
@@ -166,27 +223,71 @@ class CreateOrUpdateRecipeSerializer(serializers.ModelSerializer):
         ]
 
     def set_ingredients(self, recipe, ingredients):
-        recipe_ingredient_objects = []
-        for ingredient in ingredients:
-            ingredient_id = ingredient.get('id')
-            amount = ingredient.get('amount')
-            recipe_ingredient_object = RecipeIngredient(
+        amounts = {
+            ingredient['id'].pk: ingredient['amount']
+            for ingredient in ingredients
+        }
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=recipe
+            )
+        }
+        removed = current.keys() - amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
                 recipe=recipe,
-                ingredient=ingredient_id,
+                ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, recipe_ingredient in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        added = [
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
                 amount=amount
             )
-            recipe_ingredient_objects.append(recipe_ingredient_object)
-        RecipeIngredient.objects.bulk_create(recipe_ingredient_objects)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        ]
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+        if removed or changed or added:
+            refresh_recipe_carts([recipe.pk])
+        return bool(removed or added)
 
     def set_tags(self, recipe, tags):
-        recipe_tag_objects = []
-        for tag in tags:
-            recipe_tag_object = RecipeTag(
+        tag_ids = {tag.pk for tag in tags}
+        current = set(
+            RecipeTag.objects.filter(recipe=recipe).values_list(
+                'tag_id',
+                flat=True
+            )
+        )
+        removed = current - tag_ids
+        if removed:
+            RecipeTag.objects.filter(
                 recipe=recipe,
-                tag=tag
+                tag_id__in=removed
+            ).delete()
+        added = [
+            RecipeTag(recipe=recipe, tag_id=tag_id)
+            for tag_id in tag_ids - current
+        ]
+        if added:
+            RecipeTag.objects.bulk_create(added)
+        if removed or added:
+            recipe.tags_mask = get_tags_mask(tag_ids)
+            Recipe.objects.filter(pk=recipe.pk).update(
+                tags_mask=recipe.tags_mask
             )
-            recipe_tag_objects.append(recipe_tag_object)
-        RecipeTag.objects.bulk_create(recipe_tag_objects)
+        return bool(removed or added)
 
     def to_representation(self, recipe):
         serializer = ReadOnlyRecipeSerializer(recipe, context=self.context)
@@ -205,6 +306,7 @@ class CreateOrUpdateRecipeSerializer(serializers.ModelSerializer):
                 )
         return attrs
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags', None)
@@ -212,17 +314,21 @@ class CreateOrUpdateRecipeSerializer(serializers.ModelSerializer):
         self.set_ingredients(recipe, ingredients)
         if tags:
             self.set_tags(recipe, tags)
+        update_search_vectors(Recipe.objects.filter(pk=recipe.pk))
+        schedule_similar_recipes([recipe.pk])
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
         ingredients = validated_data.pop('ingredients', None)
         tags = validated_data.pop('tags', None)
+        changed = False
         if ingredients:
-            recipe.ingredients.clear()
-            self.set_ingredients(recipe, ingredients)
+            changed |= self.set_ingredients(recipe, ingredients)
         if tags:
-            recipe.tags.clear()
-            self.set_tags(recipe, tags)
+            changed |= self.set_tags(recipe, tags)
+        if changed:
+            schedule_similar_recipes([recipe.pk])
         return super().update(recipe, validated_data)
 
 
@@ -257,13 +363,15 @@ class SubscriptionSerializer(serializers.ModelSerializer):
 
     def check_is_subscribed(self, subscription):
         current_user = self.context.get('request').user
-        return Subscription.objects.filter(
-            author=subscription.author,
-            subscriber=current_user
-        ).exists()
+        return subscription.subscriber_id == current_user.id
 
     def get_recipes(self, subscription):
-        queryset = Recipe.objects.filter(author=subscription.author)
+        queryset = getattr(subscription, 'recipe_previews', None)
+        if queryset is None:
+            queryset = Recipe.objects.filter(author=subscription.author)
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            if recipes_limit is not None:
+                queryset = queryset[:recipes_limit]
         serializer = ShortReadOnlyRecipeSerializer(
             queryset,
             read_only=True,
@@ -272,7 +380,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         return serializer.data
 
     def count_recipes(self, subscription):
-        return Recipe.objects.filter(author=subscription.author).count()
+        return subscription.author.recipes_count
 
     class Meta:
         model = Subscription
@@ -302,3 +410,54 @@ class SubscribeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subscription
         fields = '__all__'
+
+
+class BulkRecipesSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_SIZE
+    )
+
+
+class BulkAuthorsSerializer(serializers.Serializer):
+    authors = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_SIZE
+    )
+
+
+class ShoppingCartExportSerializer(serializers.Serializer):
+    format = serializers.ChoiceField(
+        choices=[renderer.format for renderer in SHOPPING_LIST_RENDERERS],
+        default='txt'
+    )
+
+
+class JobSerializer(serializers.ModelSerializer):
+    url = serializers.HyperlinkedIdentityField(view_name='job-detail')
+    download = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            'id',
+            'url',
+            'name',
+            'status',
+            'attempts',
+            'result',
+            'download',
+            'created',
+            'finished',
+        ]
+
+    def get_download(self, job):
+        if job.status != Job.DONE or 'file' not in (job.result or {}):
+            return None
+        return reverse(
+            'job-download',
+            args=[job.pk],
+            request=self.context.get('request')
+        )
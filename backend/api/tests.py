@@ -0,0 +1,715 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.db.models import F
+from django.test import modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from api.membership import get_members
+from jobs.models import Job
+from jobs.queue import claim_job, job_storage, run_job
+from recipes.models import (
+    CartTotal,
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    Tag
+)
+
+User = get_user_model()
+
+
+class RecipeQueriesTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Иван',
+            last_name='Иванов',
+            password='password'
+        )
+        cls.tags = [
+            Tag.objects.create(
+                name=f'Тег {number}',
+                color=f'#00000{number}',
+                slug=f'tag{number}'
+            )
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}',
+                measurement_unit='г'
+            )
+            for number in range(5)
+        ]
+        for number in range(10):
+            recipe = Recipe.objects.create(
+                author=cls.user,
+                name=f'Рецепт {number}',
+                text='Текст',
+                cooking_time=10
+            )
+            recipe.tags.set(cls.tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=100
+                )
+                for ingredient in cls.ingredients
+            )
+        cls.recipe = recipe
+
+    def assertListQueries(self, number):
+        self.client.force_authenticate(self.user)
+        for limit in (1, 3, 6, 15):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(number):
+                    response = self.client.get(
+                        f'/api/recipes/?limit={limit}'
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    len(response.data['results']),
+                    min(limit, 10)
+                )
+
+    def test_list_queries(self):
+        self.assertListQueries(4)
+
+    @override_settings(MEMBERSHIP_CACHE=True)
+    def test_list_queries_with_membership_cache(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+        self.client.get('/api/recipes/')
+        self.assertListQueries(4)
+
+    def test_anonymous_list_queries(self):
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_retrieve_queries(self):
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['ingredients']), 5)
+
+
+class RecipeSaveTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Иван',
+            last_name='Иванов',
+            password='password'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.user,
+            name='Рецепт',
+            text='Текст',
+            cooking_time=10
+        )
+
+    def test_save_keeps_concurrent_counters(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        user = User.objects.get(pk=self.user.pk)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            favorites_count=F('favorites_count') + 1,
+            tags_mask=1
+        )
+        User.objects.filter(pk=user.pk).update(
+            followers_count=F('followers_count') + 1
+        )
+        recipe.name = 'Новое название'
+        recipe.save()
+        user.first_name = 'Пётр'
+        user.save()
+        recipe.refresh_from_db()
+        user.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.favorites_count, 1)
+        self.assertEqual(recipe.tags_mask, 1)
+        self.assertEqual(user.first_name, 'Пётр')
+        self.assertEqual(user.followers_count, 1)
+
+
+class RecipeUpdateWritesTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Иван',
+            last_name='Иванов',
+            password='password'
+        )
+        cls.tag = Tag.objects.create(name='Тег', color='#000000', slug='tag')
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}',
+                measurement_unit='г'
+            )
+            for number in range(4)
+        ]
+        cls.recipe = Recipe.objects.create(
+            author=cls.user,
+            name='Рецепт',
+            text='Текст',
+            cooking_time=10
+        )
+        cls.recipe.tags.set([cls.tag])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=cls.recipe,
+                ingredient=ingredient,
+                amount=100
+            )
+            for ingredient in cls.ingredients[:3]
+        )
+
+    def update(self, amounts):
+        self.client.force_authenticate(self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.pk}/',
+                {
+                    'ingredients': [
+                        {'id': ingredient.pk, 'amount': amount}
+                        for ingredient, amount in amounts
+                    ],
+                    'tags': [self.tag.pk],
+                },
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        table = connection.ops.quote_name(RecipeIngredient._meta.db_table)
+        statements = {
+            f'INSERT INTO {table} ': 'INSERT',
+            f'UPDATE {table} ': 'UPDATE',
+            f'DELETE FROM {table} ': 'DELETE',
+        }
+        return [
+            write
+            for query in context.captured_queries
+            for prefix, write in statements.items()
+            if query['sql'].startswith(prefix)
+        ]
+
+    def test_unchanged_ingredients(self):
+        writes = self.update(
+            (ingredient, 100) for ingredient in self.ingredients[:3]
+        )
+        self.assertEqual(writes, [])
+
+    def test_changed_amount(self):
+        writes = self.update(
+            [(self.ingredients[0], 200)]
+            + [(ingredient, 100) for ingredient in self.ingredients[1:3]]
+        )
+        self.assertEqual(writes, ['UPDATE'])
+
+    def test_replaced_ingredient(self):
+        writes = self.update(
+            (ingredient, 100) for ingredient in self.ingredients[1:]
+        )
+        self.assertEqual(writes, ['DELETE', 'INSERT'])
+
+
+@override_settings(SHARED_CACHE=True)
+class AnonymousResponseCacheTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Иван',
+            last_name='Иванов',
+            password='password'
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='Ингредиент',
+            measurement_unit='г'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.user,
+            name='Рецепт',
+            text='Текст',
+            cooking_time=10
+        )
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe,
+            ingredient=cls.ingredient,
+            amount=100
+        )
+
+    def test_edit_is_visible_to_anonymous(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        self.assertEqual(self.client.get(url).data['name'], 'Рецепт')
+        self.assertEqual(
+            self.client.get('/api/recipes/').data['results'][0]['name'],
+            'Рецепт'
+        )
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                url,
+                {
+                    'ingredients': [
+                        {'id': self.ingredient.pk, 'amount': 200}
+                    ],
+                    'name': 'Новое название',
+                },
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(None)
+        response = self.client.get(url)
+        self.assertEqual(response.data['name'], 'Новое название')
+        self.assertEqual(response.data['ingredients'][0]['amount'], 200)
+        self.assertEqual(
+            self.client.get('/api/recipes/').data['results'][0]['name'],
+            'Новое название'
+        )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Реплика — копия файла SQLite')
+@override_settings(
+    DATABASE_REPLICAS=['replica'],
+    DATABASE_ROUTERS=['api.replicas.ReplicaRouter']
+)
+@modify_settings(MIDDLEWARE={'prepend': 'api.replicas.ReplicaMiddleware'})
+class ReplicaRoutingTests(APITransactionTestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='Иван',
+            last_name='Иванов',
+            password='password'
+        )
+        self.reader = User.objects.create_user(
+            email='reader@example.com',
+            username='reader',
+            first_name='Пётр',
+            last_name='Петров',
+            password='password'
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='Ингредиент',
+            measurement_unit='г'
+        )
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        descriptor, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(descriptor)
+        os.remove(path)
+        self.addCleanup(os.remove, path)
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM INTO %s', [path])
+        connections.settings['replica'] = {
+            **connections['default'].settings_dict,
+            'NAME': path,
+        }
+        self.addCleanup(connections.settings.pop, 'replica')
+        self.addCleanup(connections.__delitem__, 'replica')
+        self.addCleanup(connections['replica'].close)
+
+    def get_recipes(self, user):
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        names = [recipe['name'] for recipe in response.data['results']]
+        return names, len(replica.captured_queries)
+
+    def test_read_after_write_uses_primary(self):
+        token, _ = Token.objects.get_or_create(user=self.author)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = self.client.post(
+            '/api/recipes/',
+            {
+                'ingredients': [{'id': self.ingredient.pk, 'amount': 100}],
+                'image': (
+                    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAAB'
+                    'CAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5E'
+                    'rkJggg=='
+                ),
+                'name': 'Рецепт',
+                'text': 'Текст',
+                'cooking_time': 10,
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get_recipes(self.author), (['Рецепт'], 0))
+        names, replica_queries = self.get_recipes(self.reader)
+        self.assertEqual(names, [])
+        self.assertGreater(replica_queries, 0)
+
+
+class ShoppingCartExportTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Иван',
+            last_name='Иванов',
+            password='password'
+        )
+        cls.other = User.objects.create_user(
+            email='other@example.com',
+            username='other',
+            first_name='Пётр',
+            last_name='Петров',
+            password='password'
+        )
+        CartTotal.objects.create(
+            user=cls.user,
+            name='Мука',
+            measurement_unit='г',
+            amount=500
+        )
+
+    def setUp(self):
+        files = tempfile.TemporaryDirectory()
+        self.addCleanup(files.cleanup)
+        location = job_storage.location
+        job_storage.location = files.name
+        self.addCleanup(setattr, job_storage, 'location', location)
+
+    def test_only_owner_downloads_export(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            '/api/recipes/shopping_cart_export/',
+            {'format': 'txt'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 202)
+        job = run_job(claim_job())
+        self.assertEqual(job.status, Job.DONE)
+        response = self.client.get(response['Location'])
+        self.assertIsNotNone(response.data['download'])
+        response = self.client.get(response.data['download'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            b''.join(response.streaming_content).decode(),
+            'Мука (г) — 500\n'
+        )
+        self.client.force_authenticate(self.other)
+        response = self.client.get(f'/api/jobs/{job.pk}/download/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_export_file_expires(self):
+        self.client.force_authenticate(self.user)
+        self.client.post(
+            '/api/recipes/shopping_cart_export/',
+            {'format': 'csv'},
+            format='json'
+        )
+        job = run_job(claim_job())
+        cleanup = Job.objects.get(name='jobs.delete_file')
+        Job.objects.filter(pk=cleanup.pk).update(run_at=job.created)
+        run_job(claim_job())
+        self.assertFalse(job_storage.exists(job.result['file']))
+        response = self.client.get(f'/api/jobs/{job.pk}/download/')
+        self.assertEqual(response.status_code, 404)
+
+
+class DownloadShoppingCartTests(APITestCase):
+
+    url = '/api/recipes/download_shopping_cart/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Иван',
+            last_name='Иванов',
+            password='password'
+        )
+        CartTotal.objects.create(
+            user=cls.user,
+            name='Мука',
+            measurement_unit='г',
+            amount=500
+        )
+
+    def test_unauthenticated_error_is_json(self):
+        for accept in ('*/*', 'text/csv', 'application/json'):
+            with self.subTest(accept=accept):
+                response = self.client.get(self.url, HTTP_ACCEPT=accept)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(
+                    response['Content-Type'],
+                    'application/json'
+                )
+                self.assertIn('detail', response.json())
+
+    def test_download(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.url, HTTP_ACCEPT='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Type'],
+            'text/csv; charset=utf-8'
+        )
+        self.assertEqual(
+            b''.join(response.streaming_content).decode(),
+            'Мука,г,500\r\n'
+        )
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 406)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+
+class RecipeCursorPaginationTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Иван',
+            last_name='Иванов',
+            password='password'
+        )
+        recipes = [
+            Recipe.objects.create(
+                author=cls.user,
+                name=f'Рецепт {number}',
+                text='Текст',
+                cooking_time=10
+            )
+            for number in range(7)
+        ]
+        Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in recipes[:5]]
+        ).update(pub_date=recipes[0].pub_date)
+        cls.recipe_ids = list(
+            Recipe.objects.order_by('-pub_date', '-id').values_list(
+                'pk',
+                flat=True
+            )
+        )
+
+    def test_pages_across_equal_pub_dates(self):
+        pages = []
+        url = '/api/recipes/?pagination=cursor&limit=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([recipe['id'] for recipe in response.data['results']])
+            url = response.data['next']
+        self.assertEqual(sum(pages, []), self.recipe_ids)
+        self.assertEqual(len(pages), 4)
+        previous_pages = []
+        url = response.data['previous']
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            previous_pages.append(
+                [recipe['id'] for recipe in response.data['results']]
+            )
+            url = response.data['previous']
+        self.assertEqual(previous_pages, pages[-2::-1])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/recipes/?cursor=invalid')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(MEMBERSHIP_CACHE=True)
+class MembershipCacheTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Иван',
+            last_name='Иванов',
+            password='password'
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.user,
+                name=f'Рецепт {number}',
+                text='Текст',
+                cooking_time=10
+            )
+            for number in range(2)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def add_favorite(self, recipe):
+        with self.captureOnCommitCallbacks(execute=True):
+            FavoriteRecipe.objects.create(user=self.user, recipe=recipe)
+
+    def test_forgets_members_on_change(self):
+        self.add_favorite(self.recipes[0])
+        self.assertEqual(
+            list(get_members(FavoriteRecipe, self.user)),
+            [self.recipes[0].pk]
+        )
+        self.add_favorite(self.recipes[1])
+        self.assertEqual(
+            list(get_members(FavoriteRecipe, self.user)),
+            sorted(recipe.pk for recipe in self.recipes)
+        )
+
+    def test_does_not_store_members_changed_during_load(self):
+        @contextmanager
+        def change_during_load():
+            yield
+            self.add_favorite(self.recipes[0])
+
+        with mock.patch('api.membership.use_primary', change_during_load):
+            self.assertEqual(list(get_members(FavoriteRecipe, self.user)), [])
+        self.assertEqual(
+            list(get_members(FavoriteRecipe, self.user)),
+            [self.recipes[0].pk]
+        )
+
+
+class SubscribeTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Иван',
+            last_name='Иванов',
+            password='password'
+        )
+        cls.author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='Пётр',
+            last_name='Петров',
+            password='password'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author,
+            name='Рецепт',
+            text='Текст',
+            cooking_time=10
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_subscribe(self):
+        response = self.client.post(f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['id'], self.author.pk)
+        self.assertTrue(response.data['is_subscribed'])
+        self.assertEqual(response.data['recipes_count'], 1)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['recipes']],
+            [self.recipe.pk]
+        )
+        response = self.client.post(f'/api/users/{self.author.pk}/subscribe/')
+        self.assertEqual(response.status_code, 400)
+
+    def test_subscribe_errors(self):
+        response = self.client.post(f'/api/users/{self.user.pk}/subscribe/')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/users/999999/subscribe/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_favorite(self):
+        url = f'/api/recipes/{self.recipe.pk}/favorite/'
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['id'], self.recipe.pk)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/recipes/999999/favorite/')
+        self.assertEqual(response.status_code, 404)
+
+
+class RecipeTagsFilterTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Иван',
+            last_name='Иванов',
+            password='password'
+        )
+        cls.tags = [
+            Tag.objects.create(
+                name=f'Тег {number}',
+                color=f'#00000{number}',
+                slug=f'tag{number}'
+            )
+            for number in range(2)
+        ]
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.user,
+                name=f'Рецепт {number}',
+                text='Текст',
+                cooking_time=10
+            )
+            for number in range(2)
+        ]
+
+    def get_recipe_ids(self, slug):
+        response = self.client.get(f'/api/recipes/?tags={slug}')
+        self.assertEqual(response.status_code, 200)
+        return sorted(recipe['id'] for recipe in response.data['results'])
+
+    def test_filters_after_tags_change(self):
+        recipe = self.recipes[0]
+        recipe.tags.set(self.tags)
+        self.assertEqual(self.get_recipe_ids('tag0'), [recipe.pk])
+        self.assertEqual(self.get_recipe_ids('tag1'), [recipe.pk])
+        recipe.tags.remove(self.tags[0])
+        self.assertEqual(self.get_recipe_ids('tag0'), [])
+        self.assertEqual(self.get_recipe_ids('tag1'), [recipe.pk])
+        recipe.tags.clear()
+        self.assertEqual(self.get_recipe_ids('tag1'), [])
+
+    def test_filters_after_reverse_tags_change(self):
+        tag = self.tags[0]
+        tag.recipes.add(*self.recipes)
+        self.assertEqual(
+            self.get_recipe_ids('tag0'),
+            sorted(recipe.pk for recipe in self.recipes)
+        )
+        tag.recipes.remove(self.recipes[0])
+        self.assertEqual(self.get_recipe_ids('tag0'), [self.recipes[1].pk])
+        tag.recipes.clear()
+        self.assertEqual(self.get_recipe_ids('tag0'), [])
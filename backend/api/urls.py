@@ -1,8 +1,11 @@
 from django.urls import include, path
 from rest_framework import routers
 
+from .metrics import metrics_view
 from .views import (
+    BulkSubscribeView,
     IngredientViewSet,
+    JobViewSet,
     TagViewSet,
     RecipeViewSet,
     SubscribeView,
@@ -13,9 +16,16 @@ router = routers.DefaultRouter()
 router.register('ingredients', IngredientViewSet)
 router.register('tags', TagViewSet)
 router.register('recipes', RecipeViewSet)
+router.register('jobs', JobViewSet)
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
+    path('metrics/', metrics_view, name='metrics'),
+    path(
+        'users/subscribe/',
+        BulkSubscribeView.as_view(),
+        name='users-bulk-subscribe'
+    ),
     path(
         'users/<int:pk>/subscribe/',
         SubscribeView.as_view(),
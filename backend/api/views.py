@@ -1,33 +1,71 @@
-import csv
+from hashlib import md5
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import Count, Exists, F, OuterRef, Prefetch, Window
+from django.db.models.functions import RowNumber
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status, views, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotAcceptable, ValidationError
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from .autocomplete import ingredient_index
+from .bulk import (
+    EXISTS,
+    MISSING,
+    NOT_FOUND,
+    SELF,
+    bulk_add,
+    bulk_remove
+)
 from .filters import IngredientFilter, TagFilter
-from .pagination import CustomPagination
+from .mixins import (
+    AnonymousResponseCacheMixin,
+    AsyncReadMixin,
+    ReferenceDataCacheMixin
+)
+from .pagination import (
+    CustomPagination,
+    FeedPagination,
+    RecipeCursorPagination
+)
 from .permissions import IsAuthorOrReadOnly
+from .renderers import SHOPPING_LIST_RENDERERS, ShoppingListRenderer
 from .serializers import (
+    BulkAuthorsSerializer,
+    BulkRecipesSerializer,
     CreateOrUpdateRecipeSerializer,
     IngredientSerializer,
+    JobSerializer,
+    MatchedRecipeSerializer,
     ReadOnlyRecipeSerializer,
+    ShoppingCartExportSerializer,
     ShortReadOnlyRecipeSerializer,
     SubscribeSerializer,
     SubscriptionSerializer,
-    TagSerializer
+    TagSerializer,
+    get_recipes_limit
 )
+from jobs.models import Job
+from jobs.queue import enqueue, job_storage
+from recipes.cart import get_cart_version
+from recipes.counters import count_subquery
+from recipes.feed import get_feed
 from recipes.models import (
+    CartTotal,
     FavoriteRecipe,
     Ingredient,
     Recipe,
     RecipeIngredient,
+    RecipeSimilarity,
     ShoppingCart,
     Tag
 )
@@ -35,25 +73,132 @@ from users.models import Subscription
 
 User = get_user_model()
 
+SHOPPING_LIST_CHUNK_SIZE = 500
+
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+def accepted_job_response(request, job):
+    data = JobSerializer(job, context={'request': request}).data
+    return Response(
+        data=data,
+        status=status.HTTP_202_ACCEPTED,
+        headers={'Location': data['url']}
+    )
+
+
+class TagViewSet(
+    ReferenceDataCacheMixin,
+    AsyncReadMixin,
+    viewsets.ReadOnlyModelViewSet
+):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    authentication_classes = []
     permission_classes = [AllowAny, ]
+    cache_version_name = 'tags'
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(
+    ReferenceDataCacheMixin,
+    AsyncReadMixin,
+    viewsets.ReadOnlyModelViewSet
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    authentication_classes = []
     permission_classes = [AllowAny, ]
     filterset_class = IngredientFilter
+    cache_version_name = 'ingredients'
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if settings.INGREDIENT_AUTOCOMPLETE_INDEX and name:
+            return Response(ingredient_index.search(
+                name,
+                settings.INGREDIENT_AUTOCOMPLETE_LIMIT
+            ))
+        return super().list(request, *args, **kwargs)
 
+    async def alist(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if settings.INGREDIENT_AUTOCOMPLETE_INDEX and name:
+            return Response(await sync_to_async(ingredient_index.search)(
+                name,
+                settings.INGREDIENT_AUTOCOMPLETE_LIMIT
+            ))
+        return await super().alist(request, *args, **kwargs)
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(
+    AnonymousResponseCacheMixin,
+    AsyncReadMixin,
+    viewsets.ModelViewSet
+):
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthorOrReadOnly | IsAdminUser]
     pagination_class = CustomPagination
     filterset_class = TagFilter
+    cache_query_params = (
+        'page',
+        'limit',
+        'pagination',
+        'cursor',
+        'tags',
+        'author',
+        'search',
+    )
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            query_params = self.request.query_params
+            if self.action == 'list' and (
+                query_params.get('pagination') == 'cursor'
+                or RecipeCursorPagination.cursor_query_param in query_params
+            ):
+                if query_params.get('search'):
+                    raise ValidationError({
+                        'errors': 'Поиск не поддерживает курсорную пагинацию!'
+                    })
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_queryset(self):
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.all()),
+            Prefetch(
+                'recipeingredient_set',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+        user = self.request.user
+        if user.is_anonymous or settings.MEMBERSHIP_CACHE:
+            return queryset
+        return queryset.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                user=user,
+                recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user,
+                recipe=OuterRef('pk')
+            )),
+            is_subscribed=Exists(Subscription.objects.filter(
+                subscriber=user,
+                author=OuterRef('author')
+            )),
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (
+            self.action == 'download_shopping_cart'
+            and isinstance(response, Response)
+            and response.status_code >= status.HTTP_400_BAD_REQUEST
+        ):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
 
     def get_serializer_class(self):
         ACTION_SERIALIZER_CLASS = {
@@ -61,32 +206,119 @@ class RecipeViewSet(viewsets.ModelViewSet):
             'retrieve': ReadOnlyRecipeSerializer,
             'create': CreateOrUpdateRecipeSerializer,
             'update': CreateOrUpdateRecipeSerializer,
-            'partial_update': CreateOrUpdateRecipeSerializer
+            'partial_update': CreateOrUpdateRecipeSerializer,
+            'match': MatchedRecipeSerializer,
+            'feed': ReadOnlyRecipeSerializer,
+            'similar': ShortReadOnlyRecipeSerializer
         }
         return ACTION_SERIALIZER_CLASS.get(self.action)
 
-    def create_csv_file(self, ingredients):
-        response = HttpResponse(
-            content_type='text/csv',
-            headers={
-                'Content-Disposition': 'attachment; '
-                + 'filename="shopping_list.csv"'
-            },
-            status=status.HTTP_201_CREATED
+    @action(detail=False, methods=['get', ])
+    def match(self, request):
+        ingredient_ids = {
+            ingredient_id
+            for value in request.query_params.getlist('ingredients')
+            for ingredient_id in value.split(',')
+            if ingredient_id.isdigit()
+        }
+        if not ingredient_ids:
+            return Response(
+                data={'errors': 'Укажите id ингредиентов!'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            recipeingredient__ingredient__in=ingredient_ids
+        ).annotate(
+            matched_ingredients=Count('recipeingredient', distinct=True),
+            total_ingredients=count_subquery(
+                RecipeIngredient.objects.all(),
+                'recipe'
+            )
+        ).annotate(
+            missing_ingredients=(
+                F('total_ingredients') - F('matched_ingredients')
+            )
+        ).order_by(
+            'missing_ingredients',
+            '-matched_ingredients',
+            '-pub_date',
+            '-id'
         )
-        ingredients = list(ingredients)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
-        writer = csv.DictWriter(
-            response,
-            fieldnames=[
-                'ingredient__name',
-                'ingredient__measurement_unit',
-                'ingredient_total'
+    @action(
+        detail=False,
+        methods=['get', ],
+        permission_classes=[permissions.IsAuthenticated, ]
+    )
+    def feed(self, request):
+        paginator = FeedPagination()
+        positions = paginator.paginate_feed(
+            lambda position, size: get_feed(request.user, position, size),
+            request
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for _, recipe_id in positions]
+        )
+        serializer = self.get_serializer(
+            [
+                recipes[recipe_id] for _, recipe_id in positions
+                if recipe_id in recipes
             ],
+            many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get', ])
+    def similar(self, request, pk):
+        limit = request.query_params.get('limit', '')
+        limit = min(
+            int(limit) if limit.isdigit() else settings.SIMILAR_RECIPES_COUNT,
+            settings.SIMILAR_RECIPES_COUNT
+        )
+        similar_ids = list(RecipeSimilarity.objects.filter(
+            recipe=pk
+        ).order_by('-score', 'similar_id').values_list(
+            'similar_id',
+            flat=True
+        )[:limit])
+        if not similar_ids:
+            get_object_or_404(Recipe, pk=pk)
+        recipes = Recipe.objects.in_bulk(similar_ids)
+        serializer = self.get_serializer(
+            [
+                recipes[recipe_id] for recipe_id in similar_ids
+                if recipe_id in recipes
+            ],
+            many=True
+        )
+        return Response(serializer.data)
+
+    def get_cart_etag(self, request):
+        key = ':'.join([
+            str(request.user.pk),
+            str(get_cart_version(request.user)),
+            request.accepted_renderer.format,
+        ])
+        return '"{}"'.format(md5(key.encode()).hexdigest())
+
+    def is_cart_not_modified(self, request, etag):
+        return etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+
+    def stream_shopping_list(self, ingredients):
+        renderer = self.request.accepted_renderer
+        return StreamingHttpResponse(
+            renderer.stream(ingredients),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+            headers={
+                'Content-Disposition': 'attachment; '
+                + f'filename="shopping_list.{renderer.format}"',
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no',
+            }
         )
-        for row in ingredients:
-            writer.writerow(row)
-        return response
 
     @action(
         detail=True,
@@ -112,45 +344,132 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(
         detail=False,
-        methods=['get', ],
+        methods=['post', 'delete'],
+        url_path='favorite',
+        url_name='bulk-favorite',
         permission_classes=[permissions.IsAuthenticated, ]
     )
+    def bulk_favorite(self, request):
+        return self.change_recipes(FavoriteRecipe)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart',
+        url_name='bulk-shopping-cart',
+        permission_classes=[permissions.IsAuthenticated, ]
+    )
+    def bulk_shopping_cart(self, request):
+        return self.change_recipes(ShoppingCart)
+
+    @action(
+        detail=False,
+        methods=['get', ],
+        permission_classes=[permissions.IsAuthenticated, ],
+        renderer_classes=[*SHOPPING_LIST_RENDERERS, JSONRenderer]
+    )
     def download_shopping_cart(self, request):
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_cart_recipes__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).order_by(
-            'ingredient__name'
-        ).annotate(
-            ingredient_total=Sum('amount')
+        if not isinstance(request.accepted_renderer, ShoppingListRenderer):
+            raise NotAcceptable()
+        etag = self.get_cart_etag(request)
+        if self.is_cart_not_modified(request, etag):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED,
+                headers={'ETag': etag}
+            )
+        ingredients = CartTotal.objects.filter(user=request.user).values_list(
+            'name',
+            'measurement_unit',
+            'amount'
+        ).iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+        response = self.stream_shopping_list(ingredients)
+        response['ETag'] = etag
+        return response
+
+    @action(
+        detail=False,
+        methods=['get', ],
+        permission_classes=[permissions.IsAuthenticated, ]
+    )
+    def shopping_cart_summary(self, request):
+        etag = self.get_cart_etag(request)
+        if self.is_cart_not_modified(request, etag):
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED,
+                headers={'ETag': etag}
+            )
+        ingredients = CartTotal.objects.filter(user=request.user).values(
+            'name',
+            'measurement_unit',
+            'amount'
+        )
+        return Response(
+            data={
+                'version': get_cart_version(request.user),
+                'ingredients': list(ingredients),
+            },
+            headers={'ETag': etag}
         )
-        return self.create_csv_file(ingredients)
+
+    @action(
+        detail=False,
+        methods=['post', ],
+        permission_classes=[permissions.IsAuthenticated, ]
+    )
+    def shopping_cart_export(self, request):
+        serializer = ShoppingCartExportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = enqueue(
+            'recipes.export_shopping_cart',
+            user=request.user,
+            **serializer.validated_data
+        )
+        return accepted_job_response(request, job)
 
     def perform_create(self, serializer):
         author = self.request.user
         serializer.save(author=author)
 
+    def change_recipes(self, ThroughModel):
+        serializer = BulkRecipesSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        change = bulk_add if self.request.method == 'POST' else bulk_remove
+        results = change(
+            ThroughModel,
+            self.request.user,
+            serializer.validated_data['recipes']
+        )
+        return Response(data=[
+            {'id': recipe_id, 'status': result}
+            for recipe_id, result in results.items()
+        ])
+
     def add_recipe(self, ThroughModel, pk):
-        recipe = get_object_or_404(Recipe, pk=pk)
+        try:
+            recipe_id = int(pk)
+        except ValueError:
+            raise Http404
         user = self.request.user
-        if ThroughModel.objects.filter(recipe=recipe, user=user).exists():
+        result = bulk_add(ThroughModel, user, [recipe_id])[recipe_id]
+        if result == NOT_FOUND:
+            return Response(
+                data={'errors': 'Рецепт не найден!'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if result == EXISTS:
             return Response(
                 data={'errors': 'Рецепт уже добавлен!'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        ThroughModel.objects.create(recipe=recipe, user=user)
+        recipe = get_object_or_404(Recipe, pk=recipe_id)
         serializer = ShortReadOnlyRecipeSerializer(recipe)
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
     def remove_recipe(self, ThroughModel, pk):
         recipe = get_object_or_404(Recipe, pk=pk)
         user = self.request.user
-        instance = ThroughModel.objects.filter(
-            recipe=recipe,
-            user=user
-        )
-        if not instance.exists():
+        result = bulk_remove(ThroughModel, user, [recipe.pk])[recipe.pk]
+        if result == MISSING:
             return Response(
                 data={
                     'errors': 'Нельзя удалить рецепт, '
@@ -158,48 +477,96 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 },
                 status=status.HTTP_400_BAD_REQUEST
             )
-        instance.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ListOnlySubscriptionAPIView(ListAPIView):
+class ListOnlySubscriptionAPIView(AsyncReadMixin, ListAPIView):
     serializer_class = SubscriptionSerializer
     permission_classes = [IsAuthenticated, ]
     pagination_class = CustomPagination
 
     def get_queryset(self):
         user = self.request.user
-        return user.subscribers.all()
+        return user.subscribers.select_related('author').order_by('-id')
+
+    def get_recipe_previews(self, author_ids, recipes_limit):
+        queryset = Recipe.objects.filter(author__in=author_ids)
+        if recipes_limit is None:
+            return queryset
+        sql, params = queryset.annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=F('author'),
+                order_by=F('pub_date').desc()
+            )
+        ).query.sql_with_params()
+        return Recipe.objects.raw(
+            f'SELECT * FROM ({sql}) AS previews '
+            'WHERE previews.row_number <= %s '
+            'ORDER BY previews.pub_date DESC',
+            (*params, recipes_limit)
+        )
+
+    def attach_recipe_previews(self, subscriptions):
+        recipe_previews = {
+            subscription.author_id: [] for subscription in subscriptions
+        }
+        for recipe in self.get_recipe_previews(
+            recipe_previews.keys(),
+            get_recipes_limit(self.request)
+        ):
+            recipe_previews[recipe.author_id].append(recipe)
+        for subscription in subscriptions:
+            subscription.recipe_previews = recipe_previews[
+                subscription.author_id
+            ]
+        return subscriptions
+
+    def paginate_queryset(self, queryset):
+        subscriptions = super().paginate_queryset(queryset)
+        if subscriptions is None:
+            return None
+        return self.attach_recipe_previews(subscriptions)
+
+    async def apaginate_queryset(self, queryset):
+        subscriptions = await super().apaginate_queryset(queryset)
+        if subscriptions is None:
+            return None
+        return await sync_to_async(self.attach_recipe_previews)(
+            subscriptions
+        )
 
 
 class SubscribeView(views.APIView):
     permission_classes = [IsAuthenticated, ]
 
     def post(self, request, pk):
-        author = get_object_or_404(User, pk=pk)
         subscriber = self.request.user
-        if author == subscriber:
+        result = bulk_add(Subscription, subscriber, [pk])[pk]
+        if result == NOT_FOUND:
+            return Response(
+                data={'errors': 'Пользователь не найден!'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if result == SELF:
             return Response(
                 data={'errors': 'Нельзя подписаться на самого себя!'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        if Subscription.objects.filter(
-            author=author,
-            subscriber=subscriber
-        ).exists():
+        if result == EXISTS:
             return Response(
                 data={'errors': 'Вы уже подписаны на этого пользователя!'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        subscription = get_object_or_404(
+            Subscription.objects.select_related('author'),
+            subscriber=subscriber,
+            author=pk
+        )
         serializer = SubscribeSerializer(
-            data={
-                'author': author.pk,
-                'subscriber': subscriber.pk
-            },
+            subscription,
             context={'request': request}
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, pk):
@@ -210,14 +577,55 @@ class SubscribeView(views.APIView):
                 data={'errors': 'Нельзя отписаться от самого себя!'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        subscripton = Subscription.objects.filter(
-            author=author,
-            subscriber=subscriber
-        )
-        if not subscripton.exists():
+        result = bulk_remove(Subscription, subscriber, [author.pk])[author.pk]
+        if result == MISSING:
             return Response(
                 data={'errors': 'Вы не были подписаны на этого пользователя!'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        subscripton.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class BulkSubscribeView(views.APIView):
+    permission_classes = [IsAuthenticated, ]
+
+    def change_subscriptions(self, request, change):
+        serializer = BulkAuthorsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = change(
+            Subscription,
+            request.user,
+            serializer.validated_data['authors']
+        )
+        return Response(data=[
+            {'id': author_id, 'status': result}
+            for author_id, result in results.items()
+        ])
+
+    def post(self, request):
+        return self.change_subscriptions(request, bulk_add)
+
+    def delete(self, request):
+        return self.change_subscriptions(request, bulk_remove)
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated, ]
+    pagination_class = CustomPagination
+
+    def get_queryset(self):
+        return self.queryset.filter(user=self.request.user)
+
+    @action(detail=True)
+    def download(self, request, pk):
+        job = self.get_object()
+        name = (job.result or {}).get('file')
+        if job.status != Job.DONE or name is None:
+            raise Http404
+        try:
+            file = job_storage.open(name)
+        except FileNotFoundError:
+            raise Http404
+        return FileResponse(file, as_attachment=True, filename=name)
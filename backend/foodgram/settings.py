@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
 
-from decouple import config
+from decouple import Csv, config
 from dotenv import load_dotenv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -34,6 +34,7 @@ INSTALLED_APPS = [
     'colorfield',
     'recipes',
     'users',
+    'jobs',
 ]
 
 MIDDLEWARE = [
@@ -47,6 +48,12 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+METRICS_QUERY_BUDGET = config('METRICS_QUERY_BUDGET', default=20, cast=int)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(0, 'api.metrics.QueryMetricsMiddleware')
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES_DIR = BASE_DIR / 'templates'
@@ -88,10 +95,63 @@ DATABASES = {
         ),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': config(
+            'DB_CONN_HEALTH_CHECKS',
+            default=True,
+            cast=bool,
+        ),
     }
 }
 
+DATABASE_REPLICAS = []
+for number, address in enumerate(
+    config('DB_REPLICA_HOSTS', default='', cast=Csv()),
+    start=1
+):
+    host, _, port = address.partition(':')
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DB_REPLICA_STICKY_SECONDS = config(
+    'DB_REPLICA_STICKY_SECONDS',
+    default=10,
+    cast=int,
+)
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+    MIDDLEWARE.insert(0, 'api.replicas.ReplicaMiddleware')
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            default=''
+        ),
+    }
+}
+
+SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
 
 # Authentication settings
 
@@ -161,6 +221,73 @@ REST_FRAMEWORK = {
 }
 
 
+# Ingredient autocomplete settings
+
+INGREDIENT_AUTOCOMPLETE_INDEX = config(
+    'INGREDIENT_AUTOCOMPLETE_INDEX',
+    default=False,
+    cast=bool,
+)
+INGREDIENT_AUTOCOMPLETE_LIMIT = config(
+    'INGREDIENT_AUTOCOMPLETE_LIMIT',
+    default=50,
+    cast=int,
+)
+
+
+# Membership cache settings
+
+MEMBERSHIP_CACHE = config('MEMBERSHIP_CACHE', default=False, cast=bool)
+MEMBERSHIP_CACHE_MAX_SIZE = config(
+    'MEMBERSHIP_CACHE_MAX_SIZE',
+    default=10000,
+    cast=int,
+)
+MEMBERSHIP_CACHE_TIMEOUT = config(
+    'MEMBERSHIP_CACHE_TIMEOUT',
+    default=60 * 60,
+    cast=int,
+)
+
+
+# Async read views settings
+
+ASYNC_READ_VIEWS = config('ASYNC_READ_VIEWS', default=False, cast=bool)
+
+if ASYNC_READ_VIEWS:
+    for database in DATABASES.values():
+        database['CONN_MAX_AGE'] = 0
+
+
+# Subscription feed settings
+
+FEED_FANOUT_LIMIT = config('FEED_FANOUT_LIMIT', default=1000, cast=int)
+FEED_BACKFILL_SIZE = config('FEED_BACKFILL_SIZE', default=100, cast=int)
+
+
+# Similar recipes settings
+
+SIMILAR_RECIPES_COUNT = config('SIMILAR_RECIPES_COUNT', default=10, cast=int)
+SIMILAR_RECIPES_REBUILD_INTERVAL = config(
+    'SIMILAR_RECIPES_REBUILD_INTERVAL',
+    default=60 * 60 * 24,
+    cast=int
+)
+
+
+# Background jobs settings
+
+JOBS_MAX_ATTEMPTS = config('JOBS_MAX_ATTEMPTS', default=3, cast=int)
+JOBS_RETRY_DELAY = config('JOBS_RETRY_DELAY', default=10, cast=int)
+JOBS_TIMEOUT = config('JOBS_TIMEOUT', default=60 * 10, cast=int)
+JOBS_FILES_ROOT = BASE_DIR / 'job_files'
+JOBS_FILES_TIMEOUT = config(
+    'JOBS_FILES_TIMEOUT',
+    default=60 * 60 * 24,
+    cast=int
+)
+
+
 # Djoser settings
 
 DJOSER = {
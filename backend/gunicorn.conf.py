@@ -0,0 +1,42 @@
+import multiprocessing
+import os
+
+LOCAL_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+local_cache = os.getenv('CACHE_BACKEND', default=LOCAL_CACHE) == LOCAL_CACHE
+
+bind = os.getenv('GUNICORN_BIND', default='0:8000')
+workers = int(os.getenv(
+    'GUNICORN_WORKERS',
+    default=1 if local_cache else multiprocessing.cpu_count() * 2 + 1
+))
+threads = int(os.getenv('GUNICORN_THREADS', default=1))
+conn_max_age = int(os.getenv('DB_CONN_MAX_AGE', default=60))
+
+
+def on_starting(server):
+    connections = server.cfg.workers * server.cfg.threads
+    limit = int(os.getenv('DB_MAX_CONNECTIONS', default=100))
+    server.log.info(
+        'Постоянных соединений с каждой базой: до %s '
+        '(%s воркеров по %s потоков)',
+        connections,
+        server.cfg.workers,
+        server.cfg.threads
+    )
+    if local_cache and server.cfg.workers > 1:
+        raise RuntimeError(
+            'Локальный кеш не виден другим воркерам: укажите общий '
+            'CACHE_BACKEND или запустите один воркер'
+        )
+    if 'uvicorn' in server.cfg.worker_class_str.lower() and conn_max_age:
+        raise RuntimeError(
+            'ASGI-воркер выполняет каждый запрос в новом потоке, и постоянные '
+            'соединения с базой не переиспользуются, а копятся: укажите '
+            'DB_CONN_MAX_AGE=0'
+        )
+    if connections > limit:
+        raise RuntimeError(
+            f'Воркерам может понадобиться {connections} соединений '
+            f'с базой, больше DB_MAX_CONNECTIONS={limit}'
+        )
@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'user', 'status', 'attempts', 'created')
+    list_filter = ('status', 'name')
+    readonly_fields = ('attempts', 'result', 'error', 'started', 'finished')
@@ -0,0 +1,6 @@
+from .queue import job, job_storage
+
+
+@job('jobs.delete_file')
+def delete_file(job):
+    job_storage.delete(job.payload['file'])
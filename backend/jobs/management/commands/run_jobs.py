@@ -0,0 +1,66 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from jobs.queue import claim_job, requeue_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в бд'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=1,
+            help='Количество процессов-воркеров'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1,
+            help='Пауза между проверками пустой очереди, с'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и завершиться'
+        )
+
+    def work(self, options):
+        try:
+            while True:
+                close_old_connections()
+                requeue_stale_jobs()
+                job = claim_job()
+                if job is None:
+                    if options['once']:
+                        return
+                    time.sleep(options['sleep'])
+                    continue
+                job = run_job(job)
+                self.stdout.write(f'{job}: {job.get_status_display()}')
+        except KeyboardInterrupt:
+            pass
+
+    def handle(self, *args, **options):
+        if options['processes'] <= 1:
+            self.work(options)
+            return
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=self.work, args=(options,))
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+                worker.join()
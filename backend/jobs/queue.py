@@ -0,0 +1,110 @@
+import logging
+import traceback
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+CLAIM_BATCH_SIZE = 10
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+job_storage = FileSystemStorage(location=settings.JOBS_FILES_ROOT)
+
+
+def job(name):
+    def register(handler):
+        registry[name] = handler
+        return handler
+    return register
+
+
+def enqueue(name, user=None, run_at=None, **payload):
+    if name not in registry:
+        raise LookupError(f'Неизвестная задача {name}')
+    return Job.objects.create(
+        name=name,
+        user=user,
+        payload=payload,
+        run_at=run_at or timezone.now(),
+        max_attempts=settings.JOBS_MAX_ATTEMPTS
+    )
+
+
+def save_job_file(extension, content):
+    name = job_storage.save(f'{uuid4().hex}.{extension}', ContentFile(content))
+    enqueue(
+        'jobs.delete_file',
+        run_at=timezone.now() + timedelta(
+            seconds=settings.JOBS_FILES_TIMEOUT
+        ),
+        file=name
+    )
+    return name
+
+
+def get_retry_delay(attempts):
+    return timedelta(seconds=settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def requeue_stale_jobs():
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        started__lt=now - timedelta(seconds=settings.JOBS_TIMEOUT)
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED,
+        error='Превышено время выполнения',
+        finished=now
+    )
+    stale.update(status=Job.PENDING, run_at=now)
+
+
+def claim_job():
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        status=Job.PENDING,
+        run_at__lte=now
+    ).order_by('run_at', 'id').values_list('pk', flat=True)
+    for pk in candidates[:CLAIM_BATCH_SIZE]:
+        claimed = Job.objects.filter(pk=pk, status=Job.PENDING).update(
+            status=Job.RUNNING,
+            attempts=F('attempts') + 1,
+            started=now
+        )
+        if claimed:
+            return Job.objects.select_related('user').get(pk=pk)
+    return None
+
+
+def run_job(job):
+    handler = registry.get(job.name)
+    try:
+        if handler is None:
+            raise LookupError(f'Неизвестная задача {job.name}')
+        result = handler(job)
+    except Exception:
+        logger.exception('Задача %s завершилась с ошибкой', job)
+        job.error = traceback.format_exc()
+        if handler is not None and job.attempts < job.max_attempts:
+            job.status = Job.PENDING
+            job.run_at = timezone.now() + get_retry_delay(job.attempts)
+        else:
+            job.status = Job.FAILED
+            job.finished = timezone.now()
+    else:
+        job.status = Job.DONE
+        job.result = result
+        job.error = ''
+        job.finished = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'run_at', 'finished'])
+    return job
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 
+from .cart import refresh_recipe_carts
 from .models import (
     FavoriteRecipe,
     Ingredient,
@@ -10,6 +11,8 @@ from .models import (
     ShoppingCart,
     Tag
 )
+from .search import update_search_vectors
+from .similarity import schedule_similar_recipes
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -36,16 +39,20 @@ class TagAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', 'count_favorites')
+    list_display = ('name', 'author', 'favorites_count')
     list_filter = ('name', 'author__email', 'tags')
+    list_select_related = ('author',)
+    readonly_fields = ('favorites_count',)
     inlines = [
         RecipeIngredientInline,
         RecipeTagInline
     ]
 
-    @admin.display(description='В избранном')
-    def count_favorites(self, obj):
-        return FavoriteRecipe.objects.filter(recipe=obj).count()
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        update_search_vectors(Recipe.objects.filter(pk=form.instance.pk))
+        refresh_recipe_carts([form.instance.pk])
+        schedule_similar_recipes([form.instance.pk])
 
 
 @admin.register(FavoriteRecipe)
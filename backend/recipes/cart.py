@@ -0,0 +1,95 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import CartTotal, Ingredient, ShoppingCart
+from .versions import bump_version, get_version
+
+UNIT_CONVERSIONS = {
+    'кг': ('г', 1000),
+    'л': ('мл', 1000),
+}
+
+
+def normalize_unit(measurement_unit):
+    return UNIT_CONVERSIONS.get(measurement_unit, (measurement_unit, 1))
+
+
+def get_cart_version(user):
+    return get_version(f'cart:{user.pk}')
+
+
+def invalidate_carts(user_ids):
+    def bump_cart_versions():
+        for user_id in user_ids:
+            bump_version(f'cart:{user_id}')
+    transaction.on_commit(bump_cart_versions)
+
+
+def refresh_cart_totals(users, recipes=None):
+    carts = ShoppingCart.objects.filter(user__in=users)
+    totals = CartTotal.objects.filter(user__in=users)
+    if recipes is not None:
+        names = Ingredient.objects.filter(
+            recipeingredient__recipe__in=recipes
+        ).values('name')
+        carts = carts.filter(
+            recipe__recipeingredient__ingredient__name__in=names
+        )
+        totals = totals.filter(name__in=names)
+    actual = defaultdict(int)
+    for user_id, name, measurement_unit, amount in carts.values_list(
+        'user',
+        'recipe__recipeingredient__ingredient__name',
+        'recipe__recipeingredient__ingredient__measurement_unit'
+    ).annotate(
+        amount=Sum('recipe__recipeingredient__amount')
+    ).order_by():
+        if name is None:
+            continue
+        measurement_unit, factor = normalize_unit(measurement_unit)
+        actual[user_id, name, measurement_unit] += amount * factor
+    stale, changed, touched = [], [], set()
+    for total in totals:
+        amount = actual.pop(
+            (total.user_id, total.name, total.measurement_unit),
+            None
+        )
+        if amount is None:
+            stale.append(total.pk)
+        elif amount != total.amount:
+            total.amount = amount
+            changed.append(total)
+        else:
+            continue
+        touched.add(total.user_id)
+    if stale:
+        CartTotal.objects.filter(pk__in=stale).delete()
+    if changed:
+        CartTotal.objects.bulk_update(changed, ['amount'])
+    if actual:
+        CartTotal.objects.bulk_create(
+            [
+                CartTotal(
+                    user_id=user_id,
+                    name=name,
+                    measurement_unit=measurement_unit,
+                    amount=amount
+                )
+                for (user_id, name, measurement_unit), amount
+                in actual.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['user_id', 'name', 'measurement_unit'],
+            update_fields=['amount']
+        )
+        touched.update(user_id for user_id, _, _ in actual)
+    if touched:
+        invalidate_carts(touched)
+
+
+def refresh_recipe_carts(recipes):
+    refresh_cart_totals(
+        ShoppingCart.objects.filter(recipe__in=recipes).values('user')
+    )
@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from users.models import Subscription
+
+from .models import FavoriteRecipe, Recipe
+
+User = get_user_model()
+
+
+def count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total')
+        ),
+        Value(0)
+    )
+
+
+def recount(queryset, counter, actual):
+    drifted = queryset.annotate(actual=actual).exclude(
+        **{counter: F('actual')}
+    )
+    return drifted.update(**{counter: actual})
+
+
+def recount_favorites(recipes=None):
+    if recipes is None:
+        recipes = Recipe.objects.all()
+    return recount(
+        recipes,
+        'favorites_count',
+        count_subquery(FavoriteRecipe.objects.all(), 'recipe')
+    )
+
+
+def recount_recipes(users=None):
+    if users is None:
+        users = User.objects.all()
+    return recount(
+        users,
+        'recipes_count',
+        count_subquery(Recipe.objects.all(), 'author')
+    )
+
+
+def recount_followers(users=None):
+    if users is None:
+        users = User.objects.all()
+    return recount(
+        users,
+        'followers_count',
+        count_subquery(Subscription.objects.all(), 'author')
+    )
@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.db.models import Q
+
+from users.models import Subscription
+
+from .models import FeedEntry, Recipe
+
+
+def get_fanout_authors():
+    return Q(author__followers_count__lte=settings.FEED_FANOUT_LIMIT)
+
+
+def fan_out_recipe(recipe, batch_size=1000):
+    subscriptions = Subscription.objects.filter(
+        get_fanout_authors(),
+        author=recipe.author_id
+    )
+    return len(FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=subscriber_id,
+                recipe=recipe,
+                author_id=recipe.author_id,
+                pub_date=recipe.pub_date
+            )
+            for subscriber_id in subscriptions.values_list(
+                'subscriber',
+                flat=True
+            )
+        ],
+        batch_size=batch_size,
+        ignore_conflicts=True
+    ))
+
+
+def backfill_feed(subscriber_id, author_id):
+    recipes = Recipe.objects.filter(
+        get_fanout_authors(),
+        author=author_id
+    ).order_by(
+        '-pub_date',
+        '-id'
+    ).values_list('pk', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+    return len(FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=subscriber_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date
+            )
+            for recipe_id, pub_date in recipes
+        ],
+        ignore_conflicts=True
+    ))
+
+
+def remove_from_feed(subscriber_id, author_ids):
+    return FeedEntry.objects.filter(
+        user=subscriber_id,
+        author__in=author_ids
+    ).delete()[0]
+
+
+def rebuild_feeds(users=None):
+    entries = FeedEntry.objects.all()
+    subscriptions = Subscription.objects.filter(get_fanout_authors())
+    if users is not None:
+        entries = entries.filter(user__in=users)
+        subscriptions = subscriptions.filter(subscriber__in=users)
+    entries.delete()
+    return sum(
+        backfill_feed(subscriber_id, author_id)
+        for subscriber_id, author_id in subscriptions.values_list(
+            'subscriber',
+            'author'
+        ).iterator()
+    )
+
+
+def before(queryset, position, field):
+    if position is None:
+        return queryset
+    pub_date, recipe_id = position
+    return queryset.filter(pub_date__lte=pub_date).exclude(
+        pub_date=pub_date,
+        **{f'{field}__gte': recipe_id}
+    )
+
+
+def get_feed(user, position=None, size=6):
+    entries = before(
+        FeedEntry.objects.filter(user=user),
+        position,
+        'recipe_id'
+    ).order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date',
+        'recipe_id'
+    )
+    recipes = before(
+        Recipe.objects.filter(author__in=Subscription.objects.filter(
+            subscriber=user,
+            author__followers_count__gt=settings.FEED_FANOUT_LIMIT
+        ).values('author')),
+        position,
+        'id'
+    ).order_by('-pub_date', '-id').values_list('pub_date', 'id')
+    return sorted(
+        set(entries[:size]) | set(recipes[:size]),
+        reverse=True
+    )[:size]
@@ -0,0 +1,52 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from api.renderers import SHOPPING_LIST_RENDERERS
+from jobs.queue import job, save_job_file
+
+from .models import CartTotal
+from .similarity import (
+    rebuild_similar_recipes,
+    refresh_similar_recipes,
+    schedule_similar_rebuild
+)
+
+
+@job('recipes.export_shopping_cart')
+def export_shopping_cart(job):
+    file_format = job.payload['format']
+    renderer = next(
+        renderer() for renderer in SHOPPING_LIST_RENDERERS
+        if renderer.format == file_format
+    )
+    ingredients = CartTotal.objects.filter(user=job.user).values_list(
+        'name',
+        'measurement_unit',
+        'amount'
+    )
+    return {'file': save_job_file(
+        file_format,
+        renderer.render(ingredients.iterator())
+    )}
+
+
+@job('recipes.refresh_similar_recipes')
+def refresh_similar(job):
+    refreshed = refresh_similar_recipes(job.payload['recipe_ids'])
+    schedule_similar_rebuild()
+    return {'refreshed': refreshed}
+
+
+@job('recipes.rebuild_similar_recipes')
+def rebuild_similar(job):
+    rebuilt = rebuild_similar_recipes()
+    schedule_similar_rebuild()
+    return {'rebuilt': rebuilt}
+
+
+@job('recipes.load_test_data')
+def load_test_data(job):
+    output = StringIO()
+    call_command('load_test_data', stdout=output, **job.payload)
+    return {'output': output.getvalue().splitlines()}
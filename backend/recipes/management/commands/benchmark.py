@@ -0,0 +1,145 @@
+import json
+from datetime import datetime, timezone
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа и количество SQL-запросов основных '
+        'эндпоинтов и выводит результат в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Количество запросов к каждому эндпоинту'
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кеш перед каждым запросом'
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для результата, по умолчанию stdout'
+        )
+
+    def get_user(self):
+        user = User.objects.annotate(
+            activity=(
+                Count('users_favorite_recipes', distinct=True)
+                + Count('shopping_cart_users', distinct=True)
+                + Count('subscribers', distinct=True)
+            )
+        ).order_by('-activity').first()
+        if user is None:
+            raise CommandError(
+                'В бд нет пользователей, запустите generate_data'
+            )
+        return user
+
+    def get_endpoints(self):
+        recipe = Recipe.objects.first()
+        if recipe is None:
+            raise CommandError('В бд нет рецептов, запустите generate_data')
+        tag = Tag.objects.first()
+        ingredient = Ingredient.objects.first()
+        return {
+            'recipes.list': '/api/recipes/',
+            'recipes.list.page': '/api/recipes/?page=5',
+            'recipes.list.cursor': '/api/recipes/?pagination=cursor',
+            'recipes.list.tags': f'/api/recipes/?tags={tag.slug}',
+            'recipes.list.author': f'/api/recipes/?author={recipe.author_id}',
+            'recipes.list.is_favorited': '/api/recipes/?is_favorited=1',
+            'recipes.list.is_in_shopping_cart': (
+                '/api/recipes/?is_in_shopping_cart=1'
+            ),
+            'recipes.list.search': f'/api/recipes/?search={recipe.name}',
+            'recipes.retrieve': f'/api/recipes/{recipe.pk}/',
+            'users.subscriptions': (
+                '/api/users/subscriptions/?recipes_limit=3'
+            ),
+            'recipes.download_shopping_cart': (
+                '/api/recipes/download_shopping_cart/'
+            ),
+            'recipes.feed': '/api/recipes/feed/',
+            'ingredients.autocomplete': (
+                f'/api/ingredients/?name={ingredient.name[:2]}'
+            ),
+        }
+
+    def measure(self, client, url, requests, cold):
+        latencies, queries, statuses = [], [], set()
+        for _ in range(requests):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                started = perf_counter()
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                latencies.append((perf_counter() - started) * 1000)
+            queries.append(len(context.captured_queries))
+            statuses.add(response.status_code)
+        return {
+            'url': url,
+            'status': sorted(statuses),
+            'p50_ms': round(percentile(latencies, 0.5), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'queries_p50': percentile(queries, 0.5),
+            'queries_max': max(queries),
+        }
+
+    def handle(self, *args, **options):
+        user = self.get_user()
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION='Token '
+            + Token.objects.get_or_create(user=user)[0].key
+        )
+        result = {
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'requests': options['requests'],
+            'cold_cache': options['cold'],
+            'dataset': {
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'ingredients': Ingredient.objects.count(),
+            },
+            'endpoints': {
+                name: self.measure(
+                    client,
+                    url,
+                    options['requests'],
+                    options['cold']
+                )
+                for name, url in self.get_endpoints().items()
+            },
+        }
+        output = json.dumps(result, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
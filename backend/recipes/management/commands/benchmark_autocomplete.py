@@ -0,0 +1,54 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from api.autocomplete import IngredientIndex
+from api.filters import IngredientFilter
+from api.serializers import IngredientSerializer
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает поиск ингредиентов через ORM и через индекс в памяти'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--limit', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            self.stderr.write('В базе нет ингредиентов')
+            return
+        randomizer = random.Random(options['seed'])
+        queries = []
+        for _ in range(options['queries']):
+            name = randomizer.choice(names)
+            queries.append(name[:randomizer.randint(1, min(4, len(name)))])
+
+        started = perf_counter()
+        for query in queries:
+            queryset = IngredientFilter(
+                {'name': query},
+                queryset=Ingredient.objects.all()
+            ).qs
+            IngredientSerializer(queryset, many=True).data
+        orm_time = perf_counter() - started
+
+        index = IngredientIndex()
+        started = perf_counter()
+        index.load()
+        load_time = perf_counter() - started
+        started = perf_counter()
+        for query in queries:
+            index.search(query, options['limit'])
+        index_time = perf_counter() - started
+
+        count = len(queries)
+        self.stdout.write(
+            f'ORM: {orm_time * 1000 / count:.3f} мс на запрос\n'
+            f'Индекс: {index_time * 1000 / count:.3f} мс на запрос '
+            f'(загрузка {load_time * 1000:.1f} мс)'
+        )
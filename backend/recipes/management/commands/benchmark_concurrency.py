@@ -0,0 +1,144 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from time import perf_counter
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from .benchmark import percentile
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пропускную способность запущенного сервера при '
+        'большом количестве одновременных клиентов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            action='append',
+            required=True,
+            help='Сервер в формате имя=url, например async=http://0:8000'
+        )
+        parser.add_argument(
+            '--clients',
+            default='1,10,50,200',
+            help='Количество одновременных клиентов через запятую'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=10,
+            help='Длительность замера для каждого количества клиентов, с'
+        )
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument(
+            '--token',
+            help='Токен пользователя для эндпоинтов, требующих авторизации'
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            help='Путь эндпоинта, по умолчанию основные эндпоинты чтения'
+        )
+
+    def get_paths(self, options):
+        if options['path']:
+            return options['path']
+        paths = [
+            '/api/recipes/',
+            '/api/recipes/?page=2',
+            '/api/tags/',
+            '/api/ingredients/?name=а',
+        ]
+        recipe_id = Recipe.objects.values_list('pk', flat=True).first()
+        if recipe_id is not None:
+            paths.append(f'/api/recipes/{recipe_id}/')
+        if options['token']:
+            paths.append('/api/users/subscriptions/')
+        return paths
+
+    def run_client(self, url, paths, deadline, options):
+        session = requests.Session()
+        if options['token']:
+            session.headers['Authorization'] = f'Token {options["token"]}'
+        latencies, errors = [], 0
+        for path in cycle(paths):
+            if perf_counter() >= deadline:
+                break
+            started = perf_counter()
+            try:
+                response = session.get(url + path, timeout=options['timeout'])
+                response.raise_for_status()
+            except requests.RequestException:
+                errors += 1
+                continue
+            latencies.append((path, (perf_counter() - started) * 1000))
+        return latencies, errors
+
+    def measure(self, url, clients, paths, options):
+        started = perf_counter()
+        deadline = started + options['duration']
+        with ThreadPoolExecutor(clients) as executor:
+            results = list(executor.map(
+                lambda _: self.run_client(url, paths, deadline, options),
+                range(clients)
+            ))
+        elapsed = perf_counter() - started
+        latencies = [
+            latency for client_latencies, _ in results
+            for latency in client_latencies
+        ]
+        by_path = {}
+        for path, latency in latencies:
+            by_path.setdefault(path, []).append(latency)
+        latencies = [latency for _, latency in latencies]
+        result = {
+            'requests': len(latencies),
+            'errors': sum(errors for _, errors in results),
+            'throughput_rps': round(len(latencies) / elapsed, 1),
+        }
+        if latencies:
+            result.update({
+                'p50_ms': round(percentile(latencies, 0.5), 3),
+                'p95_ms': round(percentile(latencies, 0.95), 3),
+                'p99_ms': round(percentile(latencies, 0.99), 3),
+                'paths': {
+                    path: {
+                        'p50_ms': round(percentile(values, 0.5), 3),
+                        'p95_ms': round(percentile(values, 0.95), 3),
+                    }
+                    for path, values in by_path.items()
+                },
+            })
+        return result
+
+    def handle(self, *args, **options):
+        try:
+            targets = dict(
+                target.split('=', 1) for target in options['target']
+            )
+            clients = [int(value) for value in options['clients'].split(',')]
+        except ValueError:
+            raise CommandError('Неверный формат --target или --clients')
+        paths = self.get_paths(options)
+        result = {
+            'duration': options['duration'],
+            'paths': paths,
+            'targets': {
+                name: {
+                    count: self.measure(
+                        url.rstrip('/'),
+                        count,
+                        paths,
+                        options
+                    )
+                    for count in clients
+                }
+                for name, url in targets.items()
+            },
+        }
+        self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
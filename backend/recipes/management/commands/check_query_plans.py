@@ -0,0 +1,154 @@
+import json
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, Tag
+from recipes.synthetic import generate_dataset
+
+User = get_user_model()
+
+CHECKED_TABLES = {
+    'recipes_recipe',
+    'recipes_recipeingredient',
+    'recipes_recipetag',
+    'recipes_recipesimilarity',
+    'recipes_carttotal',
+    'recipes_favoriterecipe',
+    'recipes_feedentry',
+    'recipes_shoppingcart',
+    'users_subscription',
+}
+SQLITE_SCAN_PATTERN = re.compile(r'^SCAN (\w+)$')
+TABLE_ALIAS_PATTERN = re.compile(r'"(\w+)" ([A-Z]\d+)\b')
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет бд синтетическими данными и проверяет, что запросы '
+        'основных эндпоинтов не читают большие таблицы целиком'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(
+                f'Бд {connection.vendor} не поддерживается'
+            )
+        with transaction.atomic():
+            generate_dataset(
+                users=options['users'],
+                recipes=options['recipes'],
+                seed=options['seed']
+            )
+            try:
+                problems = self.check_endpoints(options['verbosity'])
+            finally:
+                transaction.set_rollback(True)
+        if problems:
+            raise CommandError(
+                'Найдено полное чтение таблиц:\n' + '\n'.join(problems)
+            )
+        self.stdout.write('Планы запросов в порядке')
+
+    def get_endpoints(self):
+        user = User.objects.annotate(
+            favorites=Count('users_favorite_recipes')
+        ).order_by('-favorites').first()
+        recipe = Recipe.objects.first()
+        tags = Tag.objects.values_list('slug', flat=True)[:2]
+        tag_query = '&'.join(f'tags={slug}' for slug in tags)
+        return user, [
+            '/api/recipes/',
+            '/api/recipes/?page=3',
+            '/api/recipes/?pagination=cursor',
+            f'/api/recipes/?{tag_query}',
+            f'/api/recipes/?author={recipe.author_id}',
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=1',
+            f'/api/recipes/{recipe.pk}/',
+            '/api/users/subscriptions/?recipes_limit=3',
+            '/api/recipes/download_shopping_cart/',
+            '/api/recipes/feed/',
+            f'/api/recipes/{recipe.pk}/similar/',
+        ]
+
+    def find_full_scans(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return plan, list(self.walk_postgresql_plan(plan[0]['Plan']))
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = [row[-1] for row in cursor.fetchall()]
+        aliases = dict(
+            (alias, table) for table, alias in TABLE_ALIAS_PATTERN.findall(sql)
+        )
+        full_scans = []
+        for line in plan:
+            match = SQLITE_SCAN_PATTERN.search(line)
+            if match:
+                table = aliases.get(match.group(1), match.group(1))
+                full_scans.append((table, line))
+        return plan, full_scans
+
+    def walk_postgresql_plan(self, node, limited=False):
+        limited = limited or node['Node Type'] == 'Limit'
+        if node['Node Type'] == 'Seq Scan' or (
+            node['Node Type'] in ('Index Scan', 'Index Only Scan')
+            and 'Index Cond' not in node
+            and 'Filter' in node
+            and not limited
+        ):
+            yield node['Relation Name'], '{} on {} ({})'.format(
+                node['Node Type'],
+                node['Relation Name'],
+                node.get('Filter', '')
+            )
+        for child in node.get('Plans', []):
+            yield from self.walk_postgresql_plan(child, limited)
+
+    def check_endpoints(self, verbosity):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        user, endpoints = self.get_endpoints()
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=user).key
+        )
+        problems = []
+        for url in endpoints:
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            if response.status_code != 200:
+                problems.append(f'{url}: статус {response.status_code}')
+                continue
+            for query in context.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                plan, full_scans = self.find_full_scans(query['sql'])
+                if verbosity > 1:
+                    self.stdout.write(f'{query["sql"]}\n{plan}')
+                for table, description in full_scans:
+                    if table in CHECKED_TABLES:
+                        problems.append(f'{url}: {description}')
+            self.stdout.write(
+                f'{url}: {len(context.captured_queries)} запросов'
+            )
+        return problems
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.synthetic import generate_dataset
+
+
+class Command(BaseCommand):
+    help = 'Генерирует воспроизводимый синтетический набор данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument(
+            '--favorites',
+            type=int,
+            default=20,
+            help='Среднее количество избранных рецептов у пользователя'
+        )
+        parser.add_argument(
+            '--carts',
+            type=int,
+            default=5,
+            help='Среднее количество рецептов в списке покупок'
+        )
+        parser.add_argument(
+            '--subscriptions',
+            type=int,
+            default=10,
+            help='Среднее количество подписок у пользователя'
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.0,
+            help='Показатель распределения Ципфа для популярности'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = generate_dataset(
+                users=options['users'],
+                recipes=options['recipes'],
+                favorites=options['favorites'],
+                carts=options['carts'],
+                subscriptions=options['subscriptions'],
+                skew=options['skew'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+            )
+        for name, count in created.items():
+            self.stdout.write(f'{name}: {count}')
@@ -1,14 +1,24 @@
 import csv
+from functools import partial
+from itertools import islice
 
 from django.core.management.base import BaseCommand
-from progress.bar import Bar
+from django.db import connection, transaction
 
 from foodgram.settings import BASE_DIR
+from jobs.queue import enqueue
 from recipes.models import Ingredient, Tag
+from recipes.versions import bump_version
 
 file_model_dict = {
-    'tags.csv': Tag,
-    'ingredients.csv': Ingredient,
+    'tags.csv': (Tag, {
+        'update_conflicts': True,
+        'unique_fields': ['slug'],
+        'update_fields': ['name', 'color'],
+    }),
+    'ingredients.csv': (Ingredient, {
+        'ignore_conflicts': True,
+    }),
 }
 path = str(BASE_DIR) + ('/data/')
 
@@ -16,19 +26,99 @@ path = str(BASE_DIR) + ('/data/')
 class Command(BaseCommand):
     help = 'Загружает тестовые данные в бд'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одном INSERT'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Проверить загрузку и откатить транзакцию'
+        )
+        parser.add_argument(
+            '--background',
+            action='store_true',
+            help='Поставить загрузку в очередь фоновых задач'
+        )
+
     def handle(self, *args, **options):
-        for file_path, model in file_model_dict.items():
-            with open(f'{path}{file_path}') as file:
-                rows = len(file.readlines()) - 1
-                file.close()
-
-            with open(f'{path}{file_path}') as file:
-                countdown = Bar(
-                    f'Creating data from {file_path} > ',
-                    max=rows
+        if options['background']:
+            job = enqueue(
+                'recipes.load_test_data',
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run']
+            )
+            self.stdout.write(f'Задача {job} поставлена в очередь')
+            return
+        for file_path, (model, conflicts) in file_model_dict.items():
+            with open(f'{path}{file_path}', newline='') as file:
+                with transaction.atomic():
+                    before = model.objects.count()
+                    if connection.vendor == 'postgresql':
+                        rows = self.copy_rows(file, model, conflicts)
+                    else:
+                        rows = self.bulk_create_rows(
+                            file,
+                            model,
+                            conflicts,
+                            options['batch_size']
+                        )
+                    created = model.objects.count() - before
+                    if options['dry_run']:
+                        transaction.set_rollback(True)
+                    else:
+                        transaction.on_commit(partial(
+                            bump_version,
+                            f'{model._meta.model_name}s'
+                        ))
+            self.stdout.write(
+                f'{file_path}: прочитано строк {rows}, добавлено {created}'
+                + (' (dry run)' if options['dry_run'] else '')
+            )
+
+    def bulk_create_rows(self, file, model, conflicts, batch_size):
+        reader = csv.DictReader(file, delimiter=',')
+        rows = 0
+        while True:
+            batch = [model(**data) for data in islice(reader, batch_size)]
+            if not batch:
+                return rows
+            model.objects.bulk_create(batch, **conflicts)
+            rows += len(batch)
+
+    def copy_rows(self, file, model, conflicts):
+        table = model._meta.db_table
+        columns = next(csv.reader([file.readline()]))
+        quoted_columns = ', '.join(
+            connection.ops.quote_name(column) for column in columns
+        )
+        if conflicts.get('update_conflicts'):
+            on_conflict = 'ON CONFLICT ({}) DO UPDATE SET {}'.format(
+                ', '.join(conflicts['unique_fields']),
+                ', '.join(
+                    f'{field} = EXCLUDED.{field}'
+                    for field in conflicts['update_fields']
                 )
-                reader = csv.DictReader(file, delimiter=',')
-                for data in reader:
-                    model.objects.create(**data)
-                    countdown.next()
-                countdown.finish()
+            )
+        else:
+            on_conflict = 'ON CONFLICT DO NOTHING'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE import_rows ON COMMIT DROP AS '
+                f'SELECT {quoted_columns} FROM {table} WITH NO DATA'
+            )
+            cursor.copy_expert(
+                f'COPY import_rows ({quoted_columns}) '
+                'FROM STDIN WITH (FORMAT csv)',
+                file
+            )
+            cursor.execute('SELECT COUNT(*) FROM import_rows')
+            rows = cursor.fetchone()[0]
+            cursor.execute(
+                f'INSERT INTO {table} ({quoted_columns}) '
+                f'SELECT {quoted_columns} FROM import_rows {on_conflict}'
+            )
+        return rows
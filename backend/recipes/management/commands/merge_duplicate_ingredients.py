@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Min
+
+from recipes.models import Ingredient, RecipeIngredient
+from recipes.versions import invalidate_recipes
+
+MAX_AMOUNT = 32767
+
+
+class Command(BaseCommand):
+    help = (
+        'Объединяет ингредиенты с одинаковыми названием и единицей '
+        'измерения, переносит их в рецептах на оставшийся ингредиент'
+    )
+
+    def merge(self, ingredient_id, duplicate_ids):
+        rows = RecipeIngredient.objects.filter(
+            ingredient__in=[ingredient_id, *duplicate_ids]
+        ).order_by('recipe_id', 'pk')
+        kept = {}
+        extra = []
+        for row in rows:
+            if row.recipe_id in kept:
+                kept[row.recipe_id].amount += row.amount
+                extra.append(row.pk)
+            else:
+                kept[row.recipe_id] = row
+        RecipeIngredient.objects.filter(pk__in=extra).delete()
+        for row in kept.values():
+            row.ingredient_id = ingredient_id
+            row.amount = min(row.amount, MAX_AMOUNT)
+        RecipeIngredient.objects.bulk_update(
+            kept.values(),
+            ['ingredient', 'amount']
+        )
+        Ingredient.objects.filter(pk__in=duplicate_ids).delete()
+        return list(kept)
+
+    def handle(self, *args, **options):
+        groups = Ingredient.objects.values(
+            'name',
+            'measurement_unit'
+        ).annotate(
+            first=Min('pk'),
+            count=Count('pk')
+        ).filter(count__gt=1)
+        merged = 0
+        with transaction.atomic():
+            for group in groups:
+                duplicate_ids = list(Ingredient.objects.filter(
+                    name=group['name'],
+                    measurement_unit=group['measurement_unit']
+                ).exclude(pk=group['first']).values_list('pk', flat=True))
+                recipe_ids = self.merge(group['first'], duplicate_ids)
+                if recipe_ids:
+                    invalidate_recipes(recipe_ids)
+                merged += len(duplicate_ids)
+        self.stdout.write(f'Объединено дубликатов ингредиентов: {merged}')
@@ -0,0 +1,16 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.cart import refresh_cart_totals
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает итоги списков покупок всех пользователей'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            refresh_cart_totals(User.objects.values('pk'))
+        self.stdout.write('Итоги списков покупок пересчитаны')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = 'Заново заполняет ленты подписок пользователей'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = rebuild_feeds()
+        self.stdout.write(f'Добавлено записей в ленты: {created}')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import rebuild_similar_recipes
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает похожие рецепты для всех рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одном INSERT'
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_similar_recipes(options['batch_size'])
+        self.stdout.write(f'Похожие рецепты пересчитаны для {count} рецептов')
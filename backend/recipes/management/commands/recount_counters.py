@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import (
+    recount_favorites,
+    recount_followers,
+    recount_recipes
+)
+from recipes.tags import refresh_tags_masks
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики избранного, рецептов и подписчиков '
+        'и битовые маски тегов рецептов'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes = recount_favorites() + refresh_tags_masks()
+            users = recount_recipes() + recount_followers()
+        self.stdout.write(
+            f'Исправлено рецептов: {recipes}, пользователей: {users}'
+        )
@@ -0,0 +1,78 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector
+)
+from django.db import connection, connections
+from django.db.models import F, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+from .models import Recipe, RecipeIngredient
+
+SEARCH_CONFIG = 'russian'
+SEARCH_INDEX = GinIndex(
+    fields=['search_vector'],
+    name='recipe_search_vector_idx'
+)
+
+
+def is_full_text_search_supported():
+    return connection.vendor == 'postgresql'
+
+
+def create_search_index(using):
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return False
+    table = Recipe._meta.db_table
+    with connection.cursor() as cursor:
+        introspection = connection.introspection
+        if table not in introspection.table_names(cursor):
+            return False
+        if SEARCH_INDEX.name in introspection.get_constraints(cursor, table):
+            return False
+    with connection.schema_editor() as editor:
+        editor.add_index(Recipe, SEARCH_INDEX)
+    return True
+
+
+def update_search_vectors(recipes):
+    if not is_full_text_search_supported():
+        return 0
+    ingredient_names = Subquery(
+        RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    return recipes.update(
+        search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+            + SearchVector(
+                Coalesce(
+                    ingredient_names,
+                    Value(''),
+                    output_field=TextField()
+                ),
+                weight='C',
+                config=SEARCH_CONFIG
+            )
+        )
+    )
+
+
+def search_recipes(recipes, text):
+    if not is_full_text_search_supported():
+        return recipes.filter(
+            Q(name__icontains=text)
+            | Q(text__icontains=text)
+            | Q(ingredients__name__icontains=text)
+        ).distinct()
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    return recipes.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank', '-pub_date', '-id')
@@ -0,0 +1,181 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete
+)
+from django.dispatch import receiver
+
+from api.membership import MEMBERSHIP_FIELDS, forget_members
+from users.models import Subscription
+
+from .cart import refresh_cart_totals
+from .feed import backfill_feed, fan_out_recipe, remove_from_feed
+from .models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    ShoppingCart,
+    Tag
+)
+from .search import create_search_index, update_search_vectors
+from .tags import refresh_tags_masks
+from .versions import bump_version, invalidate_recipes
+
+User = get_user_model()
+
+
+@receiver(post_migrate)
+def migrated(sender, using, **kwargs):
+    if sender.name == 'recipes':
+        create_search_index(using)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    bump_version('ingredients')
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        refresh_cart_totals(ShoppingCart.objects.filter(
+            recipe__recipeingredient__ingredient=instance
+        ).values('user'))
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    user_ids = list(ShoppingCart.objects.filter(
+        recipe__recipeingredient__ingredient=instance
+    ).values_list('user', flat=True).distinct())
+    if user_ids:
+        transaction.on_commit(partial(refresh_cart_totals, user_ids))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_version('tags')
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            favorites_count=F('favorites_count') + 1
+        )
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+def favorite_deleted(sender, instance, **kwargs):
+    Recipe.objects.filter(
+        pk=instance.recipe_id,
+        favorites_count__gt=0
+    ).update(favorites_count=F('favorites_count') - 1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_created(sender, instance, created, **kwargs):
+    if created:
+        refresh_cart_totals([instance.user_id], [instance.recipe_id])
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def cart_deleted(sender, instance, **kwargs):
+    refresh_cart_totals([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=FavoriteRecipe)
+@receiver([post_save, post_delete], sender=ShoppingCart)
+@receiver([post_save, post_delete], sender=Subscription)
+def membership_changed(sender, instance, **kwargs):
+    user_field, _ = MEMBERSHIP_FIELDS[sender]
+    forget_members(sender, getattr(instance, f'{user_field}_id'))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    update_search_vectors(Recipe.objects.filter(pk=instance.pk))
+    invalidate_recipes([instance.pk])
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1
+        )
+        fan_out_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    invalidate_recipes([instance.pk])
+    User.objects.filter(
+        pk=instance.author_id,
+        recipes_count__gt=0
+    ).update(recipes_count=F('recipes_count') - 1)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            followers_count=F('followers_count') + 1
+        )
+        backfill_feed(instance.subscriber_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    User.objects.filter(
+        pk=instance.author_id,
+        followers_count__gt=0
+    ).update(followers_count=F('followers_count') - 1)
+    remove_from_feed(instance.subscriber_id, [instance.author_id])
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+@receiver([post_save, post_delete], sender=RecipeTag)
+def recipe_relation_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver([post_save, post_delete], sender=RecipeTag)
+def recipe_tag_changed(sender, instance, **kwargs):
+    refresh_tags_masks([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._cleared_recipe_ids = list(
+            instance.recipes.values_list('pk', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'post_clear':
+        recipe_ids = instance.__dict__.pop('_cleared_recipe_ids', [])
+    else:
+        recipe_ids = list(pk_set)
+    if recipe_ids:
+        refresh_tags_masks(recipe_ids)
+        invalidate_recipes(recipe_ids)
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    recipe_ids = list(
+        Recipe.objects.filter(author=instance).values_list('pk', flat=True)
+    )
+    if recipe_ids:
+        invalidate_recipes(recipe_ids)
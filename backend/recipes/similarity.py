@@ -0,0 +1,223 @@
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+from math import log, sqrt
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import enqueue
+
+from .models import Recipe, RecipeIngredient, RecipeSimilarity, RecipeTag
+
+CANDIDATE_POSTINGS_LIMIT = 1000
+FEATURE_RELATIONS = {
+    'ingredient': (RecipeIngredient, 'ingredient_id'),
+    'tag': (RecipeTag, 'tag_id'),
+}
+
+
+def get_features(recipe_ids=None):
+    features = defaultdict(set)
+    for kind, (model, field) in FEATURE_RELATIONS.items():
+        relations = model.objects.all()
+        if recipe_ids is not None:
+            relations = relations.filter(recipe__in=recipe_ids)
+        for recipe_id, feature_id in relations.values_list(
+            'recipe_id',
+            field
+        ):
+            features[recipe_id].add((kind, feature_id))
+    return features
+
+
+def get_frequencies(features):
+    feature_ids = defaultdict(set)
+    for recipe_features in features.values():
+        for kind, feature_id in recipe_features:
+            feature_ids[kind].add(feature_id)
+    frequencies = {}
+    for kind, (model, field) in FEATURE_RELATIONS.items():
+        for feature_id, count in model.objects.filter(**{
+            f'{field}__in': feature_ids[kind]
+        }).values(field).annotate(count=Count('pk')).values_list(
+            field,
+            'count'
+        ).order_by():
+            frequencies[kind, feature_id] = count
+    return frequencies
+
+
+def get_candidates(features, frequencies):
+    rare_ids = defaultdict(set)
+    for recipe_features in features.values():
+        for kind, feature_id in recipe_features:
+            if frequencies[kind, feature_id] <= CANDIDATE_POSTINGS_LIMIT:
+                rare_ids[kind].add(feature_id)
+    candidates = set()
+    for kind, (model, field) in FEATURE_RELATIONS.items():
+        if rare_ids[kind]:
+            candidates.update(model.objects.filter(**{
+                f'{field}__in': rare_ids[kind]
+            }).values_list('recipe_id', flat=True))
+    return candidates
+
+
+def get_top_scores(scores, size):
+    return dict(heapq.nlargest(
+        size,
+        scores.items(),
+        key=lambda item: (item[1], -item[0])
+    ))
+
+
+class SimilarityIndex:
+
+    def __init__(self, features, frequencies=None, total=None):
+        if frequencies is None:
+            frequencies = defaultdict(int)
+            for recipe_features in features.values():
+                for feature in recipe_features:
+                    frequencies[feature] += 1
+            total = len(features)
+        self.frequencies = frequencies
+        self.vectors = {}
+        self.postings = defaultdict(list)
+        for recipe_id, recipe_features in features.items():
+            weights = {
+                feature: log(1 + total / frequencies[feature])
+                for feature in recipe_features
+            }
+            norm = sqrt(sum(weight * weight for weight in weights.values()))
+            self.vectors[recipe_id] = {
+                feature: weight / norm for feature, weight in weights.items()
+            }
+            for feature in recipe_features:
+                self.postings[feature].append(recipe_id)
+
+    @classmethod
+    def load(cls, recipe_ids=None):
+        features = get_features(recipe_ids)
+        if recipe_ids is None:
+            return cls(features)
+        return cls(features, get_frequencies(features), Recipe.objects.count())
+
+    def similarity(self, vector, other):
+        if len(vector) > len(other):
+            vector, other = other, vector
+        return sum(
+            weight * other.get(feature, 0)
+            for feature, weight in vector.items()
+        )
+
+    def scores(self, recipe_id):
+        vector = self.vectors.get(recipe_id)
+        if not vector:
+            return {}
+        candidates = set()
+        for feature in vector:
+            if self.frequencies[feature] <= CANDIDATE_POSTINGS_LIMIT:
+                candidates.update(self.postings[feature])
+        candidates.discard(recipe_id)
+        return {
+            candidate: self.similarity(vector, self.vectors[candidate])
+            for candidate in candidates
+        }
+
+    def neighbours(self, recipe_id, size):
+        return get_top_scores(self.scores(recipe_id), size).items()
+
+
+def save_neighbours(index, recipe_ids, batch_size=1000):
+    size = settings.SIMILAR_RECIPES_COUNT
+    RecipeSimilarity.objects.bulk_create(
+        [
+            RecipeSimilarity(
+                recipe_id=recipe_id,
+                similar_id=similar_id,
+                score=score
+            )
+            for recipe_id in recipe_ids
+            for similar_id, score in index.neighbours(recipe_id, size)
+        ],
+        batch_size=batch_size
+    )
+
+
+@transaction.atomic
+def rebuild_similar_recipes(batch_size=1000):
+    index = SimilarityIndex.load()
+    RecipeSimilarity.objects.all().delete()
+    save_neighbours(index, index.vectors, batch_size)
+    return len(index.vectors)
+
+
+@transaction.atomic
+def refresh_similar_recipes(recipe_ids):
+    size = settings.SIMILAR_RECIPES_COUNT
+    recipe_ids = set(recipe_ids)
+    refreshed = recipe_ids | set(RecipeSimilarity.objects.filter(
+        similar__in=recipe_ids
+    ).values_list('recipe_id', flat=True))
+    features = get_features(refreshed)
+    candidates = get_candidates(features, get_frequencies(features))
+    index = SimilarityIndex.load(candidates | features.keys())
+    scores = {recipe_id: index.scores(recipe_id) for recipe_id in refreshed}
+    lists = {
+        recipe_id: get_top_scores(recipe_scores, size)
+        for recipe_id, recipe_scores in scores.items()
+    }
+    neighbours = set()
+    for recipe_id in recipe_ids:
+        neighbours.update(scores[recipe_id])
+    neighbours -= refreshed
+    current = defaultdict(dict)
+    for recipe_id, similar_id, score in RecipeSimilarity.objects.filter(
+        recipe__in=neighbours | refreshed
+    ).values_list('recipe_id', 'similar_id', 'score'):
+        current[recipe_id][similar_id] = score
+    for neighbour in neighbours:
+        neighbour_scores = dict(current[neighbour])
+        for recipe_id in recipe_ids:
+            if neighbour in scores[recipe_id]:
+                neighbour_scores[recipe_id] = scores[recipe_id][neighbour]
+        lists[neighbour] = get_top_scores(neighbour_scores, size)
+    changed = [
+        recipe_id for recipe_id, similar in lists.items()
+        if similar != current[recipe_id]
+    ]
+    RecipeSimilarity.objects.filter(recipe__in=changed).delete()
+    RecipeSimilarity.objects.bulk_create(
+        RecipeSimilarity(
+            recipe_id=recipe_id,
+            similar_id=similar_id,
+            score=score
+        )
+        for recipe_id in changed
+        for similar_id, score in lists[recipe_id].items()
+    )
+    return len(changed)
+
+
+def schedule_similar_recipes(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: enqueue(
+        'recipes.refresh_similar_recipes',
+        recipe_ids=recipe_ids
+    ))
+
+
+def schedule_similar_rebuild():
+    if not Job.objects.filter(
+        name='recipes.rebuild_similar_recipes',
+        status=Job.PENDING
+    ).exists():
+        enqueue(
+            'recipes.rebuild_similar_recipes',
+            run_at=timezone.now() + timedelta(
+                seconds=settings.SIMILAR_RECIPES_REBUILD_INTERVAL
+            )
+        )
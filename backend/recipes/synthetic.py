@@ -0,0 +1,169 @@
+import random
+from functools import partial
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from users.models import Subscription
+
+from .cart import refresh_cart_totals
+from .counters import recount_favorites, recount_followers, recount_recipes
+from .feed import rebuild_feeds
+from .models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    ShoppingCart,
+    Tag
+)
+from .search import update_search_vectors
+from .similarity import rebuild_similar_recipes
+from .tags import refresh_tags_masks
+from .versions import bump_version
+
+User = get_user_model()
+
+
+def popularity_weights(size, skew):
+    return list(accumulate(1 / (rank ** skew) for rank in range(1, size + 1)))
+
+
+def sample(randomizer, population, cum_weights, count):
+    chosen = dict.fromkeys(randomizer.choices(
+        population,
+        cum_weights=cum_weights,
+        k=count * 2
+    ))
+    return list(chosen)[:count]
+
+
+def generate_dataset(
+    users=50,
+    recipes=500,
+    favorites=20,
+    carts=5,
+    subscriptions=10,
+    skew=1.0,
+    seed=0,
+    batch_size=1000,
+):
+    randomizer = random.Random(seed)
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+    first_id = (User.objects.order_by('-id').values_list(
+        'id',
+        flat=True
+    ).first() or 0) + 1
+    password = make_password(None)
+    authors = User.objects.bulk_create(
+        [
+            User(
+                email=f'synthetic{number}@example.com',
+                username=f'synthetic{number}',
+                first_name='Синтетический',
+                last_name=f'Пользователь {number}',
+                password=password,
+            )
+            for number in range(first_id, first_id + users)
+        ],
+        batch_size=batch_size
+    )
+    author_weights = popularity_weights(len(authors), skew)
+    created_recipes = Recipe.objects.bulk_create(
+        [
+            Recipe(
+                author=randomizer.choices(
+                    authors,
+                    cum_weights=author_weights
+                )[0],
+                name=f'Рецепт {number}',
+                text='Синтетический рецепт для нагрузочного тестирования',
+                cooking_time=randomizer.randint(5, 180),
+            )
+            for number in range(recipes)
+        ],
+        batch_size=batch_size
+    )
+    recipe_ingredients, recipe_tags = [], []
+    for recipe in created_recipes:
+        for ingredient_id in randomizer.sample(
+            ingredient_ids,
+            min(randomizer.randint(3, 12), len(ingredient_ids))
+        ):
+            recipe_ingredients.append(RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=randomizer.randint(1, 1000)
+            ))
+        for tag_id in randomizer.sample(
+            tag_ids,
+            min(randomizer.randint(1, 3), len(tag_ids))
+        ):
+            recipe_tags.append(RecipeTag(recipe=recipe, tag_id=tag_id))
+    RecipeIngredient.objects.bulk_create(
+        recipe_ingredients,
+        batch_size=batch_size
+    )
+    RecipeTag.objects.bulk_create(recipe_tags, batch_size=batch_size)
+    refresh_tags_masks(
+        [recipe.pk for recipe in created_recipes],
+        batch_size=batch_size
+    )
+
+    recipe_weights = popularity_weights(len(created_recipes), skew)
+    favorite_objects, cart_objects, subscription_objects = [], [], []
+    for user in authors:
+        for recipe in sample(
+            randomizer,
+            created_recipes,
+            recipe_weights,
+            randomizer.randint(0, favorites * 2)
+        ):
+            favorite_objects.append(FavoriteRecipe(user=user, recipe=recipe))
+        for recipe in sample(
+            randomizer,
+            created_recipes,
+            recipe_weights,
+            randomizer.randint(0, carts * 2)
+        ):
+            cart_objects.append(ShoppingCart(user=user, recipe=recipe))
+        for author in sample(
+            randomizer,
+            authors,
+            author_weights,
+            randomizer.randint(0, subscriptions * 2)
+        ):
+            if author != user:
+                subscription_objects.append(
+                    Subscription(subscriber=user, author=author)
+                )
+    FavoriteRecipe.objects.bulk_create(
+        favorite_objects,
+        batch_size=batch_size
+    )
+    ShoppingCart.objects.bulk_create(cart_objects, batch_size=batch_size)
+    Subscription.objects.bulk_create(
+        subscription_objects,
+        batch_size=batch_size
+    )
+    recount_favorites()
+    recount_recipes()
+    recount_followers()
+    rebuild_feeds(authors)
+    refresh_cart_totals(authors)
+    rebuild_similar_recipes(batch_size)
+    update_search_vectors(Recipe.objects.filter(search_vector=None))
+    transaction.on_commit(partial(bump_version, 'recipes'))
+    return {
+        'users': len(authors),
+        'recipes': len(created_recipes),
+        'recipe_ingredients': len(recipe_ingredients),
+        'recipe_tags': len(recipe_tags),
+        'favorites': len(favorite_objects),
+        'shopping_carts': len(cart_objects),
+        'subscriptions': len(subscription_objects),
+    }
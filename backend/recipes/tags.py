@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Recipe, RecipeTag, Tag
+from .versions import get_version
+
+TAGS_MASK_WIDTH = 63
+TAGS_MASK_ENUMERATION_WIDTH = 10
+
+
+def get_tag_bit(tag_id):
+    return 1 << (tag_id - 1)
+
+
+def get_tags_mask(tag_ids):
+    mask = 0
+    for tag_id in tag_ids:
+        if tag_id <= TAGS_MASK_WIDTH:
+            mask |= get_tag_bit(tag_id)
+    return mask
+
+
+def refresh_tags_masks(recipe_ids=None, batch_size=1000):
+    recipes = Recipe.objects.all()
+    recipe_tags = RecipeTag.objects.filter(tag_id__lte=TAGS_MASK_WIDTH)
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+        recipe_tags = recipe_tags.filter(recipe__in=recipe_ids)
+    current = dict(recipes.values_list('pk', 'tags_mask'))
+    masks = dict.fromkeys(current, 0)
+    for recipe_id, tag_id in recipe_tags.values_list('recipe_id', 'tag_id'):
+        if recipe_id in masks:
+            masks[recipe_id] |= get_tag_bit(tag_id)
+    drifted = [
+        Recipe(pk=recipe_id, tags_mask=mask)
+        for recipe_id, mask in masks.items()
+        if mask != current[recipe_id]
+    ]
+    Recipe.objects.bulk_update(drifted, ['tags_mask'], batch_size=batch_size)
+    return len(drifted)
+
+
+def get_existing_tags_mask():
+    key = 'tags_mask:{}'.format(get_version('tags'))
+    mask = cache.get(key)
+    if mask is None:
+        mask = get_tags_mask(Tag.objects.values_list('pk', flat=True))
+        cache.set(key, mask)
+    return mask
+
+
+def get_matching_masks(existing, selected):
+    mask = existing
+    while mask:
+        if mask & selected:
+            yield mask
+        mask = (mask - 1) & existing
+
+
+def filter_by_tags(recipes, tags):
+    if not tags:
+        return recipes
+    if any(tag.pk > TAGS_MASK_WIDTH for tag in tags):
+        return recipes.filter(tags__in=tags).distinct()
+    selected = get_tags_mask(tag.pk for tag in tags)
+    existing = get_existing_tags_mask() | selected
+    if bin(existing).count('1') <= TAGS_MASK_ENUMERATION_WIDTH:
+        return recipes.filter(
+            tags_mask__in=list(get_matching_masks(existing, selected))
+        )
+    return recipes.alias(
+        selected_tags=F('tags_mask').bitand(selected)
+    ).filter(selected_tags__gt=0)
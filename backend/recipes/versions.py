@@ -0,0 +1,37 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'version:{}'
+
+
+def initial_version():
+    return time.time_ns() // 1000
+
+
+def get_version(name):
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    key = VERSION_KEY.format(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = initial_version()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def invalidate_recipes(recipe_ids):
+    def bump_recipe_versions():
+        bump_version('recipes')
+        for recipe_id in recipe_ids:
+            bump_version(f'recipe:{recipe_id}')
+    transaction.on_commit(bump_recipe_versions)
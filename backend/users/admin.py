@@ -6,6 +6,7 @@ from .models import Subscription, User
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_filter = ('email', 'username')
+    readonly_fields = ('recipes_count', 'followers_count')
 
 
 @admin.register(Subscription)
@@ -2,7 +2,20 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
-class User(AbstractUser):
+class DenormalizedFieldsMixin:
+    denormalized_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.denormalized_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(DenormalizedFieldsMixin, AbstractUser):
     email = models.EmailField(
         unique=True,
         blank=False,
@@ -10,6 +23,18 @@ class User(AbstractUser):
         verbose_name='Почта',
         help_text='Введи свою почту!'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
+
+    denormalized_fields = ('recipes_count', 'followers_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -43,3 +68,9 @@ class Subscription(models.Model):
                 name='unique_subscribe'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['subscriber', '-id'],
+                name='subscription_subscriber_idx'
+            ),
+        ]